@@ -0,0 +1,115 @@
+import datetime
+import json
+import logging
+import os
+import random
+from zoneinfo import ZoneInfo
+
+SLOTS = 7 * 24
+# likelihood from which a slot counts as busy, a delay ends when the next busy slot starts
+BUSY = 0.5
+
+
+class adaptive_poller:
+    # Picks the delay before the next poll from when each section has published
+    # before. Publications are counted per weekday/hour slot; slots that often
+    # see new articles are polled every min_interval, quiet slots stretch out to
+    # max_interval, and every poll in a row that finds nothing multiplies the
+    # delay by up to idle_backoff (less in busy slots). A delay never runs past
+    # the start of a busy slot. A +/- jitter fraction is applied to the result.
+    # clock and rng can be swapped for a simulated clock in tests.
+
+    def __init__(self, path: str, sections: tuple, min_interval: float = 15 * 60, max_interval: float = 4 * 3600,
+                 idle_backoff: float = 1.5, jitter: float = 0.1, timezone: str = "Asia/Singapore",
+                 clock=None, rng: random.Random = None):
+
+        self.path = path
+        self.sections = sections
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_backoff = idle_backoff
+        self.jitter = jitter
+        self.tz = ZoneInfo(timezone)
+        self.clock = clock or (lambda: datetime.datetime.now(self.tz))
+        self.rng = rng or random.Random()
+        self.logger = logging.getLogger("__main__")
+
+        # section -> publications seen per weekday/hour slot
+        self.history = {section: [0] * SLOTS for section in sections}
+        # section -> polls in a row that found nothing new
+        self.idle = {section: 0 for section in sections}
+
+        try:
+            with open(self.path, "r") as json_file:
+                saved = json.load(json_file)
+            for section in sections:
+                if len(saved.get("history", {}).get(section, [])) == SLOTS:
+                    self.history[section] = saved["history"][section]
+                self.idle[section] = saved.get("idle", {}).get(section, 0)
+        except (FileNotFoundError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                self.logger.warning(f"Poll history unreadable, starting empty: {e}")
+
+    def slot(self, when: datetime.datetime):
+        when = when.astimezone(self.tz)
+        return when.weekday() * 24 + when.hour
+
+    def seed(self, section: str, timestamps: list):
+        # Learn from past publication times when there is no history yet
+        if any(self.history[section]):
+            return
+        for ts in timestamps:
+            self.history[section][self.slot(datetime.datetime.fromtimestamp(ts, self.tz))] += 1
+
+    def record(self, section: str, new_articles: int, when: datetime.datetime = None):
+        # Feed the result of one poll of a section back into the model
+        when = when or self.clock()
+        if new_articles:
+            self.history[section][self.slot(when)] += new_articles
+            self.idle[section] = 0
+        else:
+            self.idle[section] += 1
+
+    def likelihood(self, section: str, when: datetime.datetime):
+        # 0..1, how busy this slot and the next one are compared with the busiest slot
+        # (1 for the busiest slot, and everywhere while there is no history)
+        counts = self.history[section]
+        busiest = max(counts)
+        slot = self.slot(when)
+        here = max(counts[slot], counts[(slot + 1) % SLOTS])
+        return (here + 0.5) / (busiest + 0.5)
+
+    def interval(self, section: str, when: datetime.datetime):
+        likelihood = self.likelihood(section, when)
+        span = self.max_interval - self.min_interval
+        delay = self.max_interval - span * likelihood
+        # idle polls only stretch the delay in slots that are not usually busy
+        delay *= (self.idle_backoff ** min(self.idle[section], 8)) ** (1 - likelihood)
+        delay = min(max(delay, self.min_interval), self.max_interval)
+
+        # never sleep through a busy slot, wake up when the first one ahead starts
+        hour = when.astimezone(self.tz).replace(minute=0, second=0, microsecond=0)
+        for ahead in range(1, int(delay // 3600) + 1):
+            start = hour + datetime.timedelta(hours=ahead)
+            if (start - when).total_seconds() >= delay:
+                break
+            if self.likelihood(section, start) >= BUSY:
+                return max((start - when).total_seconds(), self.min_interval)
+        return delay
+
+    def next_delay(self, when: datetime.datetime = None):
+        # Seconds until the next poll, the most urgent section decides
+        when = when or self.clock()
+        delay = min(self.interval(section, when) for section in self.sections)
+        delay *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        return max(delay, 1.0)
+
+    def next_run(self):
+        now = self.clock()
+        return now + datetime.timedelta(seconds=self.next_delay(now))
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump({"history": self.history, "idle": self.idle}, json_file)
+        os.replace(tmp_path, self.path)
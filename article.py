@@ -0,0 +1,118 @@
+import datetime
+import sys
+from collections.abc import Sequence
+from functools import lru_cache
+
+# CSA_TIME_FORMAT, the date format of the listing cards
+TIME_FORMAT = "%d %b %Y"
+
+
+@lru_cache(maxsize=4096)
+def parse_date(created: str, time_format: str = TIME_FORMAT):
+    # Listings repeat the same few dates, so articles share one datetime per date
+    return datetime.datetime.strptime(created, time_format)
+
+
+class article:
+    # One listing card. The card fields are slots and the date is parsed once,
+    # when the card is extracted, instead of on every filter pass. Fields added
+    # later (keywords, cves, products, severity, related, ...) live in a small
+    # dict that is only created when needed. Item access works like the dicts
+    # articles used to be, so embeds, enrichment and the stores read them the
+    # same way, and dict(obj) gives the JSON form.
+
+    __slots__ = ("csa", "title", "description", "created", "created_at", "section", "extra")
+
+    FIELDS = ("csa", "title", "description", "created")
+
+    def __init__(self, csa: str, title: str, description: str, created: str, section: str = None,
+                 time_format: str = TIME_FORMAT):
+
+        self.csa = csa
+        self.title = title
+        self.description = description
+        self.created = created
+        self.created_at = parse_date(created, time_format)
+        self.section = sys.intern(section) if section else None
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, record: dict, section: str = None):
+        # Rebuild an article from its JSON form (outbox rows, archive lines)
+        obj = cls(record["csa"], record["title"], record.get("description") or "", record["created"],
+                  section or record.get("section"))
+        for key, value in record.items():
+            if key not in cls.FIELDS and key != "section":
+                obj[key] = value
+        return obj
+
+    def __getitem__(self, key: str):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if key == "section" and self.section:
+            return self.section
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif key == "section":
+            self.section = sys.intern(value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key: str, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, fields: dict):
+        for key, value in fields.items():
+            self[key] = value
+
+    def keys(self):
+        keys = list(self.FIELDS)
+        if self.section:
+            keys.append("section")
+        return keys + list(self.extra or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __repr__(self):
+        return f"article({self.section}, {self.title!r}, {self.created})"
+
+
+class title_view(Sequence):
+    # Read-only titles of a list of articles, without copying them out
+
+    def __init__(self, articles: list):
+        self.articles = articles
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [obj["title"] for obj in self.articles[index]]
+        return self.articles[index]["title"]
+
+    def __len__(self):
+        return len(self.articles)
+
+    def __repr__(self):
+        return repr(list(self))
@@ -0,0 +1,144 @@
+import argparse
+import json
+import logging
+import os
+import pathlib
+import time
+from os.path import join
+
+from browser_pool import browser_pool
+from csa import csa_report
+
+ARCHIVE_PATH = join(pathlib.Path(__file__).parent.absolute(),
+                    "output/archive.jsonl")
+CHECKPOINT_PATH = join(pathlib.Path(__file__).parent.absolute(),
+                       "output/backfill.json")
+
+logger = logging.getLogger("__main__")
+
+
+class article_archive:
+    # Append-only JSONL archive of every article the crawler has read.
+    # Only the article URLs are kept in memory, the articles stay on disk.
+
+    def __init__(self, path: str):
+
+        self.path = path
+        # url -> crawl that archived it
+        self.urls = {}
+        try:
+            with open(self.path, "r") as archive_file:
+                for line in archive_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn write from a crash
+                        continue
+                    self.urls[record["csa"]] = record.get("crawl")
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, url: str):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def crawl_of(self, url: str):
+        return self.urls.get(url)
+
+    def append(self, section: str, articles: list, crawl: str):
+        with open(self.path, "a") as archive_file:
+            for obj in articles:
+                archive_file.write(json.dumps(
+                    {**obj, "section": section, "crawl": crawl}) + "\n")
+                self.urls[obj["csa"]] = crawl
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+
+
+def load_checkpoint(path: str):
+    try:
+        with open(path, "r") as json_file:
+            return json.load(json_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as json_file:
+        json.dump(checkpoint, json_file)
+    os.replace(tmp_path, path)
+
+
+def backfill_section(csa: csa_report, archive: article_archive, checkpoint: dict, section: str,
+                     max_pages: int = 500, checkpoint_path: str = CHECKPOINT_PATH):
+    """Page through one section, archiving articles until already-archived ones are reached"""
+
+    state = checkpoint.get(section) or {}
+    if state.get("done") or not state.get("crawl"):
+        # a fresh crawl, an interrupted one resumes from its next page
+        state = {"crawl": str(time.time_ns()), "next_page": 1, "done": False}
+    checkpoint[section] = state
+
+    path = csa.section_paths[section]
+    archived = 0
+    while state["next_page"] <= max_pages:
+        page = state["next_page"]
+        subdomain = path if page == 1 else f"{path}?{csa.page_param}={page}"
+        cards = csa.get_list(subdomain, cached=False)
+        if not cards:
+            break
+
+        new = [card for card in cards if card["csa"] not in archive]
+        # items archived by an earlier crawl mean everything below is already there
+        reached_archive = any(
+            card["csa"] in archive and archive.crawl_of(card["csa"]) != state["crawl"]
+            for card in cards
+        )
+        archive.append(section, new, state["crawl"])
+        archived += len(new)
+
+        state["next_page"] = page + 1
+        save_checkpoint(checkpoint_path, checkpoint)
+        logger.info(f"Backfill {section} page {page}: {len(new)} new")
+
+        # a page with nothing new past page 1 is the end of the listing (or a repeat of it)
+        if reached_archive or (not new and page > 1):
+            break
+
+    state["done"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Archive CSA alerts, advisories and bulletins page by page")
+    parser.add_argument("--section", action="append",
+                        help="section to crawl (ALERTS, ADVISORIES, BULLETINS), default all")
+    parser.add_argument("--max-pages", type=int, default=500)
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint and start every section from page 1")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    pool = browser_pool(max_tabs=1)
+    csa = csa_report(pool=pool)
+    archive = article_archive(ARCHIVE_PATH)
+    checkpoint = {} if args.restart else load_checkpoint(CHECKPOINT_PATH)
+    try:
+        for section in args.section or csa.tup_type:
+            archived = backfill_section(
+                csa, archive, checkpoint, section, args.max_pages)
+            logger.info(f"Backfill {section}: {archived} articles archived")
+    finally:
+        pool.close()
+    logger.info(f"Archive holds {len(archive)} articles")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Memory and filter throughput of article records against the plain dicts they replaced.
+
+Run from the repository root:  python benchmarks/bench_articles.py [--sizes 1000,10000,100000]
+
+"dict" is the old shape: four string fields, the date parsed with strptime on
+every filter pass and the title lists copied out after each section. "article"
+is article.article: slots, the date parsed once at extraction and the title
+list a view over the articles.
+"""
+import argparse
+import datetime
+import gc
+import pathlib
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from article import TIME_FORMAT, article, parse_date, title_view  # noqa: E402
+
+random.seed(0)
+
+
+def word(n: int):
+    return "".join(random.choices(string.ascii_lowercase, k=n))
+
+
+def cards(count: int):
+    # (csa, title, description, created) tuples, as read off a listing
+    start = datetime.date(2023, 3, 1)
+    return [(f"https://www.csa.gov.sg/alerts-advisories/alerts/{i:06d}",
+             f"Critical Vulnerability in {word(6)} {i}",
+             " ".join(word(random.randint(3, 9)) for _ in range(40)),
+             (start - datetime.timedelta(days=i // 5)).strftime(TIME_FORMAT))
+            for i in range(count)]
+
+
+def as_dicts(rows: list):
+    return [{"csa": csa, "title": title, "description": description, "created": created}
+            for csa, title, description, created in rows]
+
+
+def as_articles(rows: list):
+    return [article(csa, title, description, created, "ALERTS")
+            for csa, title, description, created in rows]
+
+
+def filter_dicts(items: list, since: datetime.datetime):
+    # the old filterlist date handling, strptime on every item
+    new = [obj for obj in items
+           if datetime.datetime.strptime(obj["created"], TIME_FORMAT) >= since]
+    return new, [obj["title"] for obj in new]
+
+
+def filter_articles(items: list, since: datetime.datetime):
+    new = [obj for obj in items if obj.created_at >= since]
+    return new, title_view(new)
+
+
+def build(make, rows: list):
+    # Build time, then the Python memory held by the records (source strings excluded)
+    gc.collect()
+    started = time.perf_counter()
+    make(rows)
+    elapsed = time.perf_counter() - started
+    parse_date.cache_clear()
+    tracemalloc.start()
+    built = make(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated article counts")
+    args = parser.parse_args()
+    since = datetime.datetime(2000, 1, 1)
+
+    print(f"{'records':<8} {'items':>8} {'build ms':>9} {'held MiB':>9} {'filter ms':>10} {'filter/s':>11}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        rows = cards(size)
+        for label, make, run in (("dict", as_dicts, filter_dicts),
+                                 ("article", as_articles, filter_articles)):
+            parse_date.cache_clear()
+            items, build_seconds, held = build(make, rows)
+            started = time.perf_counter()
+            run(items, since)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<8} {size:>8} {build_seconds * 1000:>9.1f} {held / 2 ** 20:>9.1f} "
+                  f"{elapsed * 1000:>10.1f} {size / elapsed:>11.0f}")
+            del items
+
+
+if __name__ == "__main__":
+    main()
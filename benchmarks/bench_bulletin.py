@@ -0,0 +1,97 @@
+"""Bulletin table parsing: the streaming bulletin_parser against a full lxml document tree.
+
+Run from the repository root:  python benchmarks/bench_bulletin.py [saved_bulletin.html ...]
+
+Without arguments synthetic bulletins of 1k, 10k and 50k table rows are
+used. Every measurement runs in a fresh worker process and reports wall
+time, rows per second and the growth of the worker's peak RSS, which also
+covers the memory libxml2 allocates for the tree (tracemalloc only sees
+Python objects).
+"""
+import pathlib
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+import lxml.html  # noqa: E402
+
+from bulletin import CHUNK_SIZE, column_map, entry_from_cells, cell_text, parse_bulletin, select_entries  # noqa: E402
+from matcher import keyword_matcher  # noqa: E402
+
+VENDORS = ["Cisco", "Fortinet", "Microsoft", "Apple", "Google", "VMware", "Citrix", "Oracle", "SAP", "Ivanti"]
+
+
+def synthetic_bulletin(rows: int):
+    # Shaped like a CSA security bulletin: one table per severity, a header row each
+    random.seed(rows)
+    parts = ["<html><head><title>Security Bulletin</title></head><body><h1>Security Bulletin</h1>"]
+    for severity, low, high in (("Critical", 9.0, 10.0), ("High", 7.0, 8.9), ("Medium", 4.0, 6.9)):
+        parts.append(f"<h2>{severity} Severity Vulnerabilities</h2><table><tr><th>CVE Number</th>"
+                     "<th>Description</th><th>Published</th><th>CVSSv3.1 Score</th><th>Fix information</th></tr>")
+        for i in range(rows // 3):
+            vendor = random.choice(VENDORS)
+            parts.append(
+                f"<tr><td>CVE-2024-{len(parts):05d}</td><td>{vendor} product {i} has a flaw that "
+                f"allows an attacker to <b>execute code</b> via crafted input</td><td>2024-02-{i % 28 + 1:02d}</td>"
+                f"<td>{random.uniform(low, high):.1f} {severity.upper()}</td>"
+                f"<td><a href='https://nvd.nist.gov/vuln/detail/{i}'>link</a></td></tr>")
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def streaming(page: bytes):
+    return list(parse_bulletin(page[i:i + CHUNK_SIZE] for i in range(0, len(page), CHUNK_SIZE)))
+
+
+def full_tree(page: bytes):
+    # the whole document parsed first, then walked table by table
+    entries = []
+    for table in lxml.html.fromstring(page).iter("table"):
+        fields = None
+        for row in table.iter("tr"):
+            cells = [cell_text(cell) for cell in row if cell.tag in ("td", "th")]
+            if fields is None:
+                fields = column_map(cells)
+                if fields:
+                    continue
+            entry = entry_from_cells(cells, fields)
+            if entry:
+                entries.append(entry)
+    return entries
+
+
+def worker(method: str, page: bytes):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    entries = {"streaming": streaming, "full tree": full_tree}[method](page)
+    elapsed = time.perf_counter() - started
+    grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    selected = select_entries(entries, 7.0, keyword_matcher(None, ["fortinet", "cisco"]))
+    return len(entries), len(selected), elapsed, grown
+
+
+def run(name: str, page: bytes):
+    print(f"{name} ({len(page) / 2 ** 20:.1f} MiB)")
+    for method in ("full tree", "streaming"):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            entries, selected, elapsed, grown = pool.submit(worker, method, page).result()
+        print(f"  {method:<10} {entries:>7} rows {elapsed * 1000:>9.1f} ms {entries / elapsed:>10.0f} rows/s "
+              f"{grown / 1024:>7.1f} MiB peak RSS growth, {selected} at CVSS >= 7 for the sample products")
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            run(path, pathlib.Path(path).read_bytes())
+        return
+    for rows in (1000, 10000, 50000):
+        run(f"synthetic bulletin, {rows} rows", synthetic_bulletin(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Keyword matching cost against keyword count: the old any() scan vs keyword_matcher.
+
+Run from the repository root:  python benchmarks/bench_matcher.py
+"""
+import pathlib
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from matcher import keyword_matcher  # noqa: E402
+
+random.seed(0)
+
+
+def word(n):
+    return "".join(random.choices(string.ascii_letters, k=n))
+
+
+def naive(summary, keywords, keywords_i):
+    # the original is_summ_keyword_present
+    return any(w in summary for w in keywords) or any(
+        w.lower() in summary.lower() for w in keywords_i
+    )
+
+
+def main():
+    summaries = [" ".join(word(random.randint(3, 10)) for _ in range(80))
+                 for _ in range(200)]
+    print(f"{'keywords':>9} {'build ms':>9} {'any() ms':>9} {'matcher ms':>11} {'speedup':>8}")
+    for count in (10, 100, 1000, 5000, 20000):
+        keywords = [word(random.randint(4, 16)) for _ in range(count // 2)]
+        keywords_i = [word(random.randint(4, 16)) for _ in range(count // 2)]
+
+        build = timeit.timeit(
+            lambda: keyword_matcher(keywords, keywords_i), number=1)
+        matcher = keyword_matcher(keywords, keywords_i)
+        loops = 1 if count >= 5000 else 5
+        old = timeit.timeit(lambda: [naive(s, keywords, keywords_i)
+                            for s in summaries], number=loops) / loops
+        new = timeit.timeit(lambda: [matcher.search(s)
+                            for s in summaries], number=loops) / loops
+        print(f"{count:>9} {build * 1000:>9.1f} {old * 1000:>9.1f} {new * 1000:>11.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Listing page parsing: the original BeautifulSoup path vs the extract.py backends.
+
+Run from the repository root:  python benchmarks/bench_parser.py [saved_listing.html ...]
+Without arguments synthetic listings of increasing size are used.
+"""
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extract import cards_from_html, cards_from_lxml  # noqa: E402
+
+BASE_URL = "https://www.csa.gov.sg"
+
+CARD = """<a class="m-card-article" href="/alerts-advisories/alerts/2023/al-2023-{i:05d}">
+  <div class="m-card-article__body">
+    <div class="m-card-article__title truncate-3-lines">Critical Vulnerability number {i} in Example Product</div>
+    <div class="m-card-article__desc truncate-3-lines">Example vendor has released updates to address a critical
+      vulnerability affecting Example Product versions 1.0 to 4.{i}. Users are advised to update immediately.</div>
+    <div class="m-card-article__note">02 Mar 2023</div>
+  </div>
+</a>"""
+
+
+def synthetic_listing(cards: int):
+    body = "\n".join(CARD.format(i=i) for i in range(cards))
+    return f"<html><head><title>Alerts</title></head><body><nav>{'<a href=/x>x</a>' * 200}</nav>{body}</body></html>"
+
+
+def original(html: str):
+    # the parse csa_report.get_list ran on driver.page_source before the backends existed
+    results = []
+    soup = BeautifulSoup(html, "lxml")
+    for elem in soup.select("a.m-card-article"):
+        if elem.get('href'):
+            result = {}
+            result["csa"] = f"{BASE_URL}{elem.get('href')}"
+            result["title"] = elem.find(
+                'div', class_="m-card-article__title truncate-3-lines").get_text(" ", strip=True)
+            result["description"] = elem.find(
+                'div', class_="m-card-article__desc truncate-3-lines").get_text(" ", strip=True)
+            result["created"] = elem.find(
+                'div', class_="m-card-article__note").get_text(" ", strip=True)
+            results.append(result)
+    return results
+
+
+def run(name: str, html: str):
+    loops = max(1, 200_000 // max(len(html) // 100, 1))
+    timings = {}
+    for label, parse in (("original bs4", original),
+                         ("bs4 backend", lambda h: cards_from_html(h, BASE_URL)),
+                         ("lxml backend", lambda h: cards_from_lxml(h, BASE_URL))):
+        cards = len(parse(html))
+        timings[label] = timeit.timeit(
+            lambda: parse(html), number=loops) / loops
+    baseline = timings["original bs4"]
+    print(f"{name} ({cards} cards, {len(html) // 1024} KiB)")
+    for label, seconds in timings.items():
+        print(f"  {label:<13} {seconds * 1000:>9.2f} ms  {baseline / seconds:>5.1f}x")
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            run(path, pathlib.Path(path).read_text(encoding="utf-8"))
+        return
+    for cards in (12, 100, 1000):
+        run("synthetic listing", synthetic_listing(cards))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Import and startup time of main.py, to catch heavy imports creeping back onto the startup path.
+
+Run from the repository root:  python benchmarks/bench_startup.py [--runs 5] [--budget-ms 400]
+
+Every run is a fresh interpreter importing main, the way a --once run from
+cron starts. Reports the median wall time of the whole process, the modules
+with the largest cumulative import time (python -X importtime) and the heavy
+dependencies that were loaded at import. Exits with status 1 when the median
+goes over --budget-ms, so it can run as a CI step.
+"""
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+# should only be loaded by the paths that need them
+LAZY = ("selenium", "discord", "bs4", "yaml", "flask", "aiohttp", "apscheduler")
+
+PROBE = "import sys, main; print(','.join(m for m in {lazy!r} if m in sys.modules))"
+
+
+def run(*args: str):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def wall(*args: str):
+    started = time.perf_counter()
+    result = run(*args)
+    return time.perf_counter() - started, result.stdout.strip()
+
+
+def import_times(stderr: str):
+    # (cumulative microseconds, module) for every line of -X importtime output
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=0,
+                        help="fail when the median startup is slower, 0 to only report")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    walls = []
+    for _ in range(args.runs):
+        seconds, loaded = wall("-c", PROBE.format(lazy=LAZY))
+        walls.append(seconds)
+    median = statistics.median(walls)
+    baseline = statistics.median(wall("-c", "pass")[0] for _ in range(args.runs))
+
+    rows = import_times(run("-X", "importtime", "-c", "import main").stderr)
+    print(f"python -c 'import main': {median * 1000:.0f} ms median of {args.runs} "
+          f"({(median - baseline) * 1000:.0f} ms over a bare interpreter)")
+    print(f"heavy modules loaded at import: {loaded or 'none'}")
+    print(f"{'cumulative ms':>14}  module")
+    for cumulative, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+    if args.budget_ms and median * 1000 > args.budget_ms:
+        print(f"over budget: {median * 1000:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Offline benchmark suite for the scrape-filter-render-deliver pipeline.
+
+Run from the repository root:  python benchmarks/run.py [--sizes 1000,10000,100000] [--only parse,filter]
+
+Every stage runs on synthetic inputs (or saved listings for the parse stage,
+see bench_parser.py) and webhook delivery goes to a local stub server, so no
+network access is needed. Each row reports wall time, throughput and the
+peak memory allocated by Python while the stage ran.
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import pathlib
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+from discord import Embed  # noqa: E402
+
+from article import article  # noqa: E402
+from bench_parser import synthetic_listing  # noqa: E402
+from csa import csa_report  # noqa: E402
+from delivery import delivery_queue, pack_embeds  # noqa: E402
+from extract import cards_from_html, cards_from_lxml  # noqa: E402
+from matcher import keyword_matcher  # noqa: E402
+from seen_store import seen_store  # noqa: E402
+from subscribers import DEFAULT, subscriber, subscriber_index  # noqa: E402
+
+random.seed(0)
+
+VENDORS = ["Cisco", "Fortinet", "Microsoft", "Apple", "Google", "VMware", "Citrix",
+           "Atlassian", "Oracle", "SAP", "Juniper", "Palo Alto", "Ivanti", "F5"]
+
+
+def word(n: int):
+    return "".join(random.choices(string.ascii_lowercase, k=n))
+
+
+def synthetic_articles(count: int):
+    # Listing cards shaped like get_list results, newest first
+    start = datetime.date(2023, 3, 1)
+    articles = []
+    for i in range(count):
+        vendor = random.choice(VENDORS)
+        created = start - datetime.timedelta(days=i // 5)
+        articles.append(article(
+            f"https://www.csa.gov.sg/alerts-advisories/alerts/{i:06d}",
+            f"Critical Vulnerability in {vendor} {word(6)} {i}",
+            f"{vendor} has released updates for {word(8)} " +
+            " ".join(word(random.randint(3, 9)) for _ in range(40)),
+            created.strftime("%d %b %Y"),
+        ))
+    return articles
+
+
+def measure(label: str, items: int, fn):
+    # Run fn once, returning a result row with time and Python peak memory
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return label, items, elapsed, peak
+
+
+def bench_parse(sizes: list):
+    rows = []
+    for size in sizes:
+        # a single listing page never holds more than a few thousand cards
+        cards = min(size, 5000)
+        html = synthetic_listing(cards)
+        rows.append(measure("parse bs4", cards, lambda: cards_from_html(
+            html, "https://www.csa.gov.sg")))
+        rows.append(measure("parse lxml", cards, lambda: cards_from_lxml(
+            html, "https://www.csa.gov.sg")))
+    return rows
+
+
+def bench_filter(sizes: list, csa: csa_report):
+    rows = []
+    for size in sizes:
+        articles = synthetic_articles(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            csa.seen = seen_store(f"{tmp}/seen.log", max_entries=size * 2)
+            rows.append(measure("filterlist migrate", size, lambda: csa.filterlist(
+                articles, datetime.datetime(2000, 1, 1), "ALERTS")))
+            rows.append(measure("filterlist seen", size, lambda: csa.filterlist(
+                articles, datetime.datetime(2000, 1, 1), "ALERTS")))
+            rows.append(measure("seen commit", size, csa.seen.commit))
+    return rows
+
+
+def bench_match(sizes: list):
+    rows = []
+    summaries = [a["description"] for a in synthetic_articles(2000)]
+    for size in sizes:
+        keywords = [word(random.randint(5, 14)) for _ in range(size // 2)]
+        keywords_i = [word(random.randint(5, 14)) for _ in range(size // 2)]
+        holder = {}
+        rows.append(measure("matcher build", size, lambda: holder.setdefault(
+            "m", keyword_matcher(keywords, keywords_i))))
+        matcher = holder["m"]
+        rows.append(measure(f"match {len(summaries)} texts", size,
+                    lambda: [matcher.search(s) for s in summaries]))
+    return rows
+
+
+def bench_route(sizes: list):
+    # size // 20 subscribers with 20 keywords each, one routing pass per article
+    rows = []
+    articles = synthetic_articles(2000)
+    for size in sizes:
+        subscribers = [subscriber(f"team-{i}", "WEBHOOK", ("ALERTS",), keywords_i=[
+            word(random.randint(5, 12)) for _ in range(19)] + [random.choice(VENDORS)])
+            for i in range(max(size // 20, 1))]
+        holder = {}
+        rows.append(measure(f"route build {len(subscribers)} subs", size, lambda: holder.setdefault(
+            "index", subscriber_index(subscribers))))
+        index = holder["index"]
+        rows.append(measure(f"route {len(subscribers)} subs", len(articles),
+                    lambda: [index.route(a, "ALERTS") for a in articles]))
+    return rows
+
+
+def bench_embeds(sizes: list, csa: csa_report):
+    rows = []
+    for size in sizes:
+        articles = synthetic_articles(size)
+        rows.append(measure("embed build", size, lambda: [
+            csa.generate_new_alert_message(a) for a in articles]))
+    return rows
+
+
+async def _deliver(embeds: list, rate_limit_every: int):
+    posts = {"count": 0}
+
+    async def webhook(request):
+        await request.read()
+        posts["count"] += 1
+        if rate_limit_every and posts["count"] % rate_limit_every == 0:
+            return web.json_response({"retry_after": 0.05, "global": False}, status=429)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post("/webhook", webhook)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            queue = delivery_queue(
+                f"http://127.0.0.1:{port}/webhook", session, max_in_flight=4)
+            queue.start()
+            for batch in pack_embeds(embeds):
+                queue.submit(batch)
+            await queue.join()
+            await queue.close()
+            return queue.stats()
+    finally:
+        await runner.cleanup()
+
+
+def bench_delivery(sizes: list):
+    rows = []
+    for size in sizes:
+        # the webhook stub is local but every post is a real HTTP round-trip
+        embeds = [Embed(title=f"Alert {i}", description="x" * 300)
+                  for i in range(min(size, 10000))]
+        for every, label in ((0, "deliver"), (10, "deliver 429/10")):
+            stats = {}
+            row = measure(label, len(embeds), lambda: stats.update(
+                asyncio.run(_deliver(embeds, every))))
+            rows.append(row)
+            print(f"    {label}: {stats}")
+    return rows
+
+
+STAGES = ("parse", "filter", "match", "route", "embeds", "delivery")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated synthetic input sizes")
+    parser.add_argument("--only", default=",".join(STAGES),
+                        help=f"comma separated stages out of {', '.join(STAGES)}")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    stages = args.only.split(",")
+
+    csa = csa_report()
+    csa.subscribers = subscriber_index([subscriber(
+        DEFAULT, "DISCORD_WEBHOOK_URL", csa.tup_type, False,
+        keywords_i=[word(8) for _ in range(500)] + VENDORS[:3])])
+
+    rows = []
+    if "parse" in stages:
+        rows += bench_parse(sizes)
+    if "filter" in stages:
+        rows += bench_filter(sizes, csa)
+    if "match" in stages:
+        rows += bench_match(sizes)
+    if "route" in stages:
+        rows += bench_route(sizes)
+    if "embeds" in stages:
+        rows += bench_embeds(sizes, csa)
+    if "delivery" in stages:
+        rows += bench_delivery(sizes)
+
+    print(f"{'stage':<22} {'items':>8} {'seconds':>9} {'items/s':>11} {'peak MiB':>9}")
+    for label, items, elapsed, peak in rows:
+        print(f"{label:<22} {items:>8} {elapsed:>9.3f} {items / elapsed:>11.0f} {peak / 2 ** 20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+from metrics import STAGE_SECONDS
+
+try:
+    import psutil
+except ImportError:  # RSS recycling is skipped without psutil
+    psutil = None
+
+
+class browser_pool:
+    # Long-lived headless chrome sessions handed out to csa_report.get_list.
+    # Selenium sessions are not thread safe, so every concurrent "tab" is its
+    # own warm session; max_tabs caps how many exist at once. A session is
+    # recycled after max_pages page loads or once its process tree goes above
+    # max_rss_mb.
+
+    def __init__(self, max_tabs: int = 2, max_pages: int = 50, max_rss_mb: int = 600):
+
+        self.max_tabs = max_tabs
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+
+        self.logger = logging.getLogger("__main__")
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_tabs)
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _launch(self):
+        # selenium is only loaded once a listing actually needs a browser
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+
+        # run the browser in headless mode (without GUI)
+        options.add_argument('--headless')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-dev-shm-usage')
+
+        with STAGE_SECONDS.time(stage="browser_launch", section="all"):
+            driver = webdriver.Chrome(options=options)
+        self._pages[id(driver)] = 0
+        self.logger.info(f"Browser pool: launched chrome ({id(driver)})")
+        return driver
+
+    def _quit(self, driver):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.warning(f"Browser pool: quit failed, {e}")
+
+    def rss_mb(self, driver):
+        # Resident memory of chromedriver and every chrome process it spawned
+        if psutil is None:
+            return 0
+        try:
+            root = psutil.Process(driver.service.process.pid)
+            procs = [root] + root.children(recursive=True)
+            return sum(p.memory_info().rss for p in procs) / (1024 * 1024)
+        except (psutil.Error, AttributeError):
+            return 0
+
+    def _worn_out(self, driver):
+        if self._pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        return self.max_rss_mb and self.rss_mb(driver) > self.max_rss_mb
+
+    @contextmanager
+    def tab(self):
+        # Borrow a warm session, launching one if none is idle
+        if self._closed:
+            raise RuntimeError("browser pool is closed")
+
+        self._slots.acquire()
+        driver = None
+        healthy = False
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self._launch()
+            yield driver
+            healthy = True
+        finally:
+            if driver is not None:
+                self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+                if not healthy or self._closed or self._worn_out(driver):
+                    self.logger.info(
+                        f"Browser pool: recycling chrome ({id(driver)})")
+                    self._quit(driver)
+                else:
+                    try:
+                        # drop the page so an idle session holds as little memory as possible
+                        driver.get("about:blank")
+                        self._idle.put(driver)
+                    except Exception:
+                        self._quit(driver)
+            self._slots.release()
+
+    def close(self):
+        # Quit every idle session, sessions in use are quit when returned
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    self._quit(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+        self.logger.info("Browser pool: closed")
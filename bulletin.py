@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import TYPE_CHECKING
+
+from lxml import etree
+
+from enrich import CVE_PATTERN
+
+# aiohttp is only loaded once there are bulletins to expand
+if TYPE_CHECKING:
+    import aiohttp
+
+SCORE_PATTERN = re.compile(r"\b(10(?:\.0)?|\d\.\d)\b")
+
+# header text -> entry field, the first matching pattern wins
+COLUMNS = (
+    ("cve", re.compile(r"\bcve\b", re.I)),
+    ("cvss", re.compile(r"cvss|score", re.I)),
+    ("vendor", re.compile(r"vendor", re.I)),
+    ("product", re.compile(r"product|software|affected", re.I)),
+    ("summary", re.compile(r"description|summary|details?|vulnerability", re.I)),
+)
+
+CHUNK_SIZE = 64 * 1024
+MAX_SUMMARY = 120
+# Discord's limit on the text of a single embed, description included
+MAX_EMBED_CHARS = 6000
+
+logger = logging.getLogger("__main__")
+
+
+def cell_text(cell):
+    return " ".join(" ".join(cell.itertext()).split())
+
+
+def column_map(cells: list):
+    # {cell position: field} for a header row, empty when the row isn't a header
+    fields = {}
+    for position, text in enumerate(cells):
+        for field, pattern in COLUMNS:
+            if field not in fields.values() and pattern.search(text) and not CVE_PATTERN.search(text):
+                fields[position] = field
+                break
+    return fields if "cve" in fields.values() or "cvss" in fields.values() else {}
+
+
+def entry_from_cells(cells: list, fields: dict):
+    # One vulnerability row, None for rows without a CVE ID
+    entry = {"cve": None, "cvss": None, "vendor": "", "product": "", "summary": ""}
+    for position, text in enumerate(cells):
+        field = fields.get(position)
+        if field == "cvss":
+            score = SCORE_PATTERN.search(text)
+            entry["cvss"] = float(score.group(1)) if score else None
+        elif field and field != "cve":
+            entry[field] = text
+    # the CVE column first, a CVE ID anywhere in the row otherwise
+    cve_cells = [text for position, text in enumerate(cells) if fields.get(position) == "cve"]
+    cve = CVE_PATTERN.search(" ".join(cve_cells)) or CVE_PATTERN.search(" ".join(cells))
+    if cve is None:
+        return None
+    entry["cve"] = cve.group(0).upper()
+    if len(entry["summary"]) > MAX_SUMMARY:
+        entry["summary"] = entry["summary"][:MAX_SUMMARY] + "..."
+    return entry
+
+
+class bulletin_parser:
+    # Incremental parser for the vulnerability tables of a bulletin page. Bytes
+    # are fed as they arrive and every finished table row is turned into an
+    # entry, then dropped from the tree, so memory stays flat however many
+    # rows the bulletin lists. Each table's header row decides which cell is
+    # the CVE, CVSS score, vendor, product and summary.
+
+    def __init__(self):
+
+        self._parser = etree.HTMLPullParser(events=("start", "end"), tag=("table", "tr"))
+        # column map of every open table, innermost last (None until its first row)
+        self._tables = []
+
+    def _rows(self):
+        entries = []
+        for event, element in self._parser.read_events():
+            if element.tag == "table":
+                if event == "start":
+                    self._tables.append(None)
+                elif self._tables:
+                    self._tables.pop()
+                    element.clear()
+                continue
+            if event != "end" or not self._tables:
+                continue
+
+            cells = [cell_text(cell) for cell in element if cell.tag in ("td", "th")]
+            fields = self._tables[-1]
+            if cells and fields is None:
+                # first row of the table, a table without a header row only yields CVE IDs
+                fields = self._tables[-1] = column_map(cells)
+                if fields:
+                    cells = []
+            if cells:
+                entry = entry_from_cells(cells, fields)
+                if entry:
+                    entries.append(entry)
+
+            # the row is done with, drop it and everything parsed before it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        return entries
+
+    def feed(self, data: bytes):
+        # Parse the next chunk, returns the entries of the rows it completed
+        self._parser.feed(data)
+        return self._rows()
+
+    def close(self):
+        self._parser.close()
+        return self._rows()
+
+
+def parse_bulletin(chunks):
+    # Every entry of a bulletin page read from an iterable of byte chunks
+    parser = bulletin_parser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def select_entries(entries: list, min_cvss: float = 0, product_matcher=None):
+    # Entries at or above min_cvss that name a configured product, highest score first.
+    # Entries without a score only pass when no threshold is set; an empty matcher matches everything.
+    selected = []
+    for entry in entries:
+        if min_cvss and (entry["cvss"] is None or entry["cvss"] < min_cvss):
+            continue
+        if product_matcher is not None and len(product_matcher) and not product_matcher.search(
+                f"{entry['vendor']} {entry['product']} {entry['summary']}"):
+            continue
+        selected.append(entry)
+    return sorted(selected, key=lambda entry: entry["cvss"] or 0, reverse=True)
+
+
+async def fetch_entries(session: aiohttp.ClientSession, url: str, timeout: int = 60):
+    # Stream a bulletin page through the parser
+    import aiohttp
+
+    parser = bulletin_parser()
+    entries = []
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            entries += parser.feed(chunk)
+    return entries + parser.close()
+
+
+async def expand_bulletins(articles: list, min_cvss: float = 0, max_parallel: int = 4):
+    # Add the table entries at or above min_cvss to each bulletin, highest score first, as
+    # "entries" plus "entries_total" (every entry read); the product filter is up to the
+    # caller, since every subscriber has its own
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def expand(session, article):
+        async with semaphore:
+            try:
+                entries = await fetch_entries(session, article["csa"])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Bulletin not expanded, {article['csa']}: {e}")
+                return
+        article["entries_total"] = len(entries)
+        article["entries"] = select_entries(entries, min_cvss)
+
+    if not articles:
+        return
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(expand(session, article) for article in articles))
+
+
+def entry_line(entry: dict):
+    # `CVE-2024-0001` **9.8** Vendor Product - summary
+    score = f"**{entry['cvss']}**" if entry["cvss"] is not None else "n/a"
+    names = " ".join(name for name in (entry["vendor"], entry["product"]) if name)
+    line = f"`{entry['cve']}` {score}"
+    if names:
+        line += f" {names}"
+    if entry["summary"]:
+        line += f" - {entry['summary']}"
+    return line
+
+
+def entries_description(article, max_chars: int = 4000):
+    # Embed description listing a bulletin's matching entries, at most max_chars long
+    lines = []
+    size = 0
+    matched = article.get("entries_matched", len(article["entries"]))
+    for position, entry in enumerate(article["entries"]):
+        line = entry_line(entry)
+        # room for the "... and N more" line whenever entries are left out after this one
+        tail = len(f"\n... and {matched} more") if position + 1 < matched else 0
+        if size + len(line) + 1 + tail > max_chars:
+            break
+        lines.append(line)
+        size += len(line) + 1
+    more = matched - len(lines)
+    if more > 0:
+        lines.append(f"... and {more} more")
+    return "\n".join(lines)
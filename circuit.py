@@ -0,0 +1,36 @@
+import time
+
+
+class circuit_breaker:
+    # Per-section circuit breaker. After threshold failures in a row a section
+    # is skipped until its backoff runs out (base_delay doubling per further
+    # failure, capped at max_delay); the next attempt after that is a trial and
+    # a success closes the circuit again.
+
+    def __init__(self, threshold: int = 3, base_delay: float = 600, max_delay: float = 6 * 3600, clock=time.monotonic):
+
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+
+        self.failures = {}
+        self.open_until = {}
+
+    def allow(self, section: str):
+        return self.clock() >= self.open_until.get(section, 0)
+
+    def success(self, section: str):
+        self.failures[section] = 0
+        self.open_until.pop(section, None)
+
+    def failure(self, section: str):
+        # Record a failure, returns the seconds the section is now skipped for
+        failures = self.failures.get(section, 0) + 1
+        self.failures[section] = failures
+        if failures < self.threshold:
+            return 0
+        delay = min(self.max_delay, self.base_delay *
+                    2 ** (failures - self.threshold))
+        self.open_until[section] = self.clock() + delay
+        return delay
@@ -1,22 +1,37 @@
+from __future__ import annotations
+
 import datetime
-import json
 import logging
+import os
 import pathlib
 import sys
-import yaml
-import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from discord import Color, Embed, HTTPException
+import time
 from os.path import join
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING
+from article import title_view
+from browser_pool import browser_pool
+from bulletin import MAX_EMBED_CHARS, entries_description, expand_bulletins, select_entries
+from digest import paginate
+from enrich import article_enricher
+from matcher import keyword_matcher
+from metrics import ARTICLES, FETCH_PATHS, STAGE_SECONDS
+from revisions import fingerprint, fingerprint_store, render_change
+from seen_store import seen_store
+from similarity import similarity_index
+from state_journal import state_journal
+from subscribers import DEFAULT, subscriber, subscriber_from_config, subscriber_index
+from http_cache import cards_digest, http_cache, session
+from extract import HTML_PARSERS, cards_from_driver, cards_from_json, extract_cards
 #from typing import List, Tuple
 
+# selenium, discord and yaml are imported where they are used, so a one-shot
+# run that finds nothing new never pays for loading them
+if TYPE_CHECKING:
+    from discord import Embed
+
 
 class csa_report:
-    def __init__(self):
+    def __init__(self, pool: browser_pool = None):
 
         self.CSA_URL = "https://www.csa.gov.sg"
         self.CSA_JSON_PATH = join(
@@ -24,199 +39,700 @@ class csa_report:
         )
         self.CSA_TIME_FORMAT = "%d %b %Y"
 
+        # validators of the listing pages, so unchanged listings are not rendered again
+        self.CSA_CACHE_PATH = join(
+            pathlib.Path(__file__).parent.absolute(), "output/http_cache.json"
+        )
+        self.http_cache = http_cache(self.CSA_CACHE_PATH)
+
+        # every article already handled, replaces the last title/date watermark
+        self.CSA_SEEN_PATH = join(
+            pathlib.Path(__file__).parent.absolute(), "output/seen.log"
+        )
+        self.seen = seen_store(self.CSA_SEEN_PATH)
+
+        # detail pages of new articles, cached by url and validator
+        self.CSA_DETAIL_CACHE_PATH = join(
+            pathlib.Path(__file__).parent.absolute(), "output/detail_cache"
+        )
+        self.enricher = article_enricher(self.CSA_DETAIL_CACHE_PATH)
+
+        # recently notified articles of every section, to merge near-duplicates
+        self.CSA_SIMILARITY_PATH = join(
+            pathlib.Path(__file__).parent.absolute(), "output/similarity.json"
+        )
+        self.similarity = similarity_index(self.CSA_SIMILARITY_PATH)
+
+        # content fingerprints of notified articles, to catch later revisions
+        self.CSA_FINGERPRINT_PATH = join(
+            pathlib.Path(__file__).parent.absolute(), "output/fingerprints.json"
+        )
+        self.fingerprints = fingerprint_store(self.CSA_FINGERPRINT_PATH)
+
         self.ALERT_CREATED = datetime.datetime.now() - datetime.timedelta(days=1)
         self.ADV_CREATED = datetime.datetime.now() - datetime.timedelta(days=1)
         self.BULLET_CREATED = datetime.datetime.now() - datetime.timedelta(days=1)
 
-        self.last_title_dict = {'ALERT_LATEST_TITLE': '',
-                                'ADV_LATEST_TITLE': '', 'BULLET_LATEST_TITLE': ''}
+        self.last_title_dict = {'ALERTS_LATEST_TITLE': '',
+                                'ADVISORIES_LATEST_TITLE': '', 'BULLETINS_LATEST_TITLE': ''}
 
         self.logger = logging.getLogger("__main__")
         self.logger.setLevel(logging.INFO)
 
+        # this tick's articles per section, the title lists are views over them
         self.new_alerts = []
-        self.new_alerts_title = []
+        self.new_alerts_title = title_view(self.new_alerts)
         self.new_advs = []
-        self.new_advs_title = []
+        self.new_advs_title = title_view(self.new_advs)
         self.new_bullet = []
-        self.new_bullet_title = []
+        self.new_bullet_title = title_view(self.new_bullet)
 
         self.tup_type = ("ALERTS", "ADVISORIES", "BULLETINS")
 
+        # shared browser sessions, a private one is started per call when not given
+        self.pool = pool
+
+        # listing page of every section
+        self.section_paths = {
+            self.tup_type[0]: "alerts-advisories/alerts",
+            self.tup_type[1]: "alerts-advisories/Advisories",
+            self.tup_type[2]: "alerts-advisories/security-bulletins",
+        }
+
+        # filter step for every section; main.itscheckintime fetches the listings
+        # concurrently and runs these on the results
+        self.sections = {
+            self.tup_type[0]: self.filter_new_alerts,
+            self.tup_type[1]: self.filter_new_advs,
+            self.tup_type[2]: self.filter_new_bulletin,
+        }
+
+        # embed builder for every section, used when draining the outbox
+        self.message_builders = {
+            self.tup_type[0]: self.generate_new_alert_message,
+            self.tup_type[1]: self.generate_new_adv_message,
+            self.tup_type[2]: self.generate_new_bulletin_message,
+        }
+
+        # articles published since the last poll per section, keyword matches or not
+        self.published = {}
+
+        # this tick's already notified articles whose card changed, per section
+        self.revised = {}
+
+        # embed colour of every section (discord brand_red, blue and yellow), also used for digests
+        self.section_colors = {
+            self.tup_type[0]: 0xED4245,
+            self.tup_type[1]: 0x3498DB,
+            self.tup_type[2]: 0xFEE75C,
+        }
+
+        # which extraction path ran for each subdomain ("unchanged", "static", "embedded", "json" or "browser")
+        self.fetch_path = {}
+
         # Load keywords from config file
         self.KEYWORDS_CONFIG_PATH = join(
             pathlib.Path(__file__).parent.absolute(), "config/config.yaml"
         )
-        try:
-
-            with open(self.KEYWORDS_CONFIG_PATH, "r") as yaml_file:
-                keywords_config = yaml.safe_load(yaml_file)
-                self.logger.info(f"Loaded keywords: {keywords_config}")
-                self.valid = keywords_config["ALL_VALID"]
-                self.keywords_i = keywords_config["DESCRIPTION_KEYWORDS_I"]
-                self.keywords = keywords_config["DESCRIPTION_KEYWORDS"]
-                self.product_i = keywords_config["PRODUCT_KEYWORDS_I"]
-                self.product = keywords_config["PRODUCT_KEYWORDS"]
-            yaml_file.close()
-        except Exception as e:
-            self.logger.error(e)
+        self.config_mtime = None
+        # nothing to fall back on yet
+        if not self.load_config():
             sys.exit(1)
 
+        # record.json is the snapshot, changes in between go to an append-only journal
+        self.CSA_JOURNAL_PATH = join(
+            pathlib.Path(__file__).parent.absolute(), "output/record.journal"
+        )
+        self.state = state_journal(self.CSA_JSON_PATH, self.CSA_JOURNAL_PATH)
+
+        # attribute holding the created watermark of every section
+        self.created_attrs = {
+            self.tup_type[0]: "ALERT_CREATED",
+            self.tup_type[1]: "ADV_CREATED",
+            self.tup_type[2]: "BULLET_CREATED",
+        }
+        self.remember_lasttimes()
+
     ################## LOAD CONFIGURATIONS ####################
 
-    def load_lasttimes(self):
-        # Load lasttimes from json file
+    def load_config(self):
+        # Read and compile the config, the current one is kept if the file is bad
 
-        try:
+        import yaml
 
-            with open(self.CSA_JSON_PATH, "r") as json_file:
-                csa_record = json.load(json_file)
-                self.last_title_dict[f'{self.tup_type[0]}_LATEST_TITLE'] = csa_record[f'{self.tup_type[0]}_LATEST_TITLE']
-                self.last_title_dict[f'{self.tup_type[1]}_LATEST_TITLE'] = csa_record[f'{self.tup_type[1]}_LATEST_TITLE']
-                self.last_title_dict[f'{self.tup_type[2]}_LATEST_TITLE'] = csa_record[f'{self.tup_type[2]}_LATEST_TITLE']
-                self.ALERT_CREATED = datetime.datetime.strptime(
-                    csa_record[f'{self.tup_type[0]}_CREATED'], self.CSA_TIME_FORMAT)
-                self.ADV_CREATED = datetime.datetime.strptime(
-                    csa_record[f'{self.tup_type[1]}_CREATED'], self.CSA_TIME_FORMAT
-                )
-                self.BULLET_CREATED = datetime.datetime.strptime(
-                    csa_record[f'{self.tup_type[2]}_CREATED'], self.CSA_TIME_FORMAT
-                )
-            json_file.close()
-        # If error, just keep the fault date (today - 1 day)
+        try:
+            self.config_mtime = os.stat(self.KEYWORDS_CONFIG_PATH).st_mtime
+            with open(self.KEYWORDS_CONFIG_PATH, "r") as yaml_file:
+                keywords_config = yaml.safe_load(yaml_file)
+            valid = keywords_config["ALL_VALID"]
+            keywords_i = keywords_config["DESCRIPTION_KEYWORDS_I"]
+            keywords = keywords_config["DESCRIPTION_KEYWORDS"]
+            product_i = keywords_config["PRODUCT_KEYWORDS_I"]
+            product = keywords_config["PRODUCT_KEYWORDS"]
+            # product names picked out of detail pages by the enricher, compiled once per config load
+            product_matcher = keyword_matcher(product, product_i)
+            # the top-level filter is the default subscriber, SUBSCRIBERS adds channels of their own
+            subscribers = subscriber_index(
+                [subscriber(DEFAULT, "DISCORD_WEBHOOK_URL", self.tup_type, valid,
+                            keywords, keywords_i, product, product_i)]
+                + [subscriber_from_config(entry, self.tup_type)
+                   for entry in keywords_config.get("SUBSCRIBERS") or []])
+            # optional JSON endpoints that fill the listing cards, keyed by subdomain
+            listing_endpoints = keywords_config.get("LISTING_ENDPOINTS") or {}
+            # extraction backends, "lxml" or "bs4" for html and "script" or "page_source" in the browser
+            html_parser = keywords_config.get("HTML_PARSER") or "lxml"
+            browser_extraction = keywords_config.get(
+                "BROWSER_EXTRACTION") or "script"
+            # chrome tabs shared by the sections, one each by default so no section waits for a render
+            browser_tabs = int(keywords_config.get("BROWSER_TABS") or len(self.tup_type))
+            if html_parser not in HTML_PARSERS:
+                raise ValueError(f"unknown HTML_PARSER {html_parser}")
+            # sections coalesced into digests (the others go out one embed per article at once),
+            # DIGEST_WINDOW_MINUTES holds them that long, 0 sends one digest per tick
+            digest_sections = keywords_config.get("DIGEST_SECTIONS") or []
+            digest_window = float(
+                keywords_config.get("DIGEST_WINDOW_MINUTES") or 0)
+            digest_min_items = int(keywords_config.get("DIGEST_MIN_ITEMS") or 2)
+            # read the vulnerability table of new bulletins and post only its entries at or above
+            # BULLETIN_MIN_CVSS that name a PRODUCT_KEYWORDS product
+            bulletin_entries = bool(keywords_config.get("BULLETIN_ENTRIES"))
+            bulletin_min_cvss = float(
+                keywords_config.get("BULLETIN_MIN_CVSS") or 0)
+            bulletin_max_entries = int(
+                keywords_config.get("BULLETIN_MAX_ENTRIES") or 25)
+            # notified articles are re-checked for revisions for TRACK_UPDATES_DAYS, 0 turns it off
+            track_updates_days = float(
+                keywords_config.get("TRACK_UPDATES_DAYS", 30) or 0)
+            # near-duplicates across sections and the last DEDUPE_DAYS are sent once, 0 turns it off
+            dedupe_days = float(keywords_config.get("DEDUPE_DAYS") or 0)
+            dedupe_threshold = float(
+                keywords_config.get("DEDUPE_THRESHOLD") or 0.6)
+            # time budget of one section in a tick, a slower section counts as failed
+            section_timeout = float(
+                keywords_config.get("SECTION_TIMEOUT_SECONDS") or 60)
+            # polling, "adaptive" learns when sections publish while "cron" keeps the fixed weekday schedule
+            schedule = {
+                "mode": keywords_config.get("SCHEDULE_MODE") or "adaptive",
+                "min_minutes": float(keywords_config.get("POLL_MIN_MINUTES") or 15),
+                "max_minutes": float(keywords_config.get("POLL_MAX_MINUTES") or 240),
+                "probe_minutes": float(keywords_config.get("PROBE_MINUTES") or 10),
+            }
+            if schedule["mode"] not in ("adaptive", "cron"):
+                raise ValueError(f"unknown SCHEDULE_MODE {schedule['mode']}")
+            # liveness and /metrics server of the long-running mode, KEEP_ALIVE_PORT 0 turns it off
+            keep_alive = {
+                "host": keywords_config.get("KEEP_ALIVE_HOST") or "127.0.0.1",
+                "port": int(keywords_config.get("KEEP_ALIVE_PORT", 8081) or 0),
+            }
+            # query parameter that selects a listing page, used by the backfill crawler
+            page_param = keywords_config.get("LISTING_PAGE_PARAM") or "page"
+            # optional detail page enrichment of new articles
+            enrich_details = bool(keywords_config.get("ENRICH_DETAILS"))
+            enrich_max_parallel = int(
+                keywords_config.get("ENRICH_MAX_PARALLEL") or 4)
+            if browser_extraction not in ("script", "page_source"):
+                raise ValueError(
+                    f"unknown BROWSER_EXTRACTION {browser_extraction}")
         except Exception as e:
-            self.logger.error(f"ERROR-1: {e}")
+            self.logger.error(f"Config not loaded: {e}")
+            return False
+
+        self.logger.info(f"Loaded keywords: {keywords_config}")
+        self.valid = valid
+        self.keywords_i = keywords_i
+        self.keywords = keywords
+        self.product_i = product_i
+        self.product = product
+        self.product_matcher = product_matcher
+        self.subscribers = subscribers
+        self.listing_endpoints = listing_endpoints
+        self.html_parser = html_parser
+        self.browser_extraction = browser_extraction
+        self.browser_tabs = browser_tabs
+        self.enrich_details = enrich_details
+        self.page_param = page_param
+        self.schedule = schedule
+        self.keep_alive = keep_alive
+        self.section_timeout = section_timeout
+        self.digest_sections = digest_sections
+        self.digest_window = digest_window
+        self.digest_min_items = digest_min_items
+        self.enricher.max_parallel = enrich_max_parallel
+        self.dedupe_days = dedupe_days
+        self.track_updates_days = track_updates_days
+        self.fingerprints.window_days = track_updates_days
+        self.bulletin_entries = bulletin_entries
+        self.bulletin_min_cvss = bulletin_min_cvss
+        self.bulletin_max_entries = bulletin_max_entries
+        self.similarity.window_days = dedupe_days
+        self.similarity.threshold = dedupe_threshold
+        return True
+
+    def reload_config(self):
+        # Recompile the config only when the file changed, a bad file keeps the last good config
 
-    def update_lasttimes(self):
-        # Save lasttimes in json file
         try:
+            mtime = os.stat(self.KEYWORDS_CONFIG_PATH).st_mtime
+        except OSError as e:
+            self.logger.error(f"Config not reloaded, keeping the current one: {e}")
+            return False
+        if mtime == self.config_mtime:
+            return False
+        if not self.load_config():
+            self.logger.error("Config not reloaded, keeping the current one")
+            return False
+        return True
+
+    def load_lasttimes(self):
+        # Load lasttimes from the recovered state (record.json plus journal)
+
+        for section, created_attr in self.created_attrs.items():
+            try:
+                self.last_title_dict[f'{section}_LATEST_TITLE'] = self.state.get(
+                    f'{section}_LATEST_TITLE', '')
+                created = self.state.get(f'{section}_CREATED')
+                if created:
+                    setattr(self, created_attr, datetime.datetime.strptime(
+                        created, self.CSA_TIME_FORMAT))
+            # If error, just keep the fault date (today - 1 day)
+            except Exception as e:
+                self.logger.error(f"ERROR-1: {section}: {e}")
+        self.remember_lasttimes()
+
+    def remember_lasttimes(self):
+        # Watermarks as last saved, restored by rollback()
+        self.saved_lasttimes = (dict(self.last_title_dict),
+                                {attr: getattr(self, attr) for attr in self.created_attrs.values()})
 
-            with open(self.CSA_JSON_PATH, "w") as json_file:
-                json.dump(
-                    {
-                        f"{self.tup_type[0]}_CREATED": self.ALERT_CREATED.strftime(
-                            self.CSA_TIME_FORMAT
-                        ),
-                        f"{self.tup_type[0]}_LATEST_TITLE": self.last_title_dict[f'{self.tup_type[0]}_LATEST_TITLE'],
-                        f"{self.tup_type[1]}_CREATED": self.ADV_CREATED.strftime(
-                            self.CSA_TIME_FORMAT
-                        ),
-                        f"{self.tup_type[1]}_LATEST_TITLE": self.last_title_dict[f'{self.tup_type[1]}_LATEST_TITLE'],
-                        f"{self.tup_type[2]}_CREATED": self.BULLET_CREATED.strftime(
-                            self.CSA_TIME_FORMAT
-                        ),
-                        f"{self.tup_type[2]}_LATEST_TITLE": self.last_title_dict[f'{self.tup_type[2]}_LATEST_TITLE']
-                    },
-                    json_file,
+    def update_lasttimes(self):
+        # Journal the per-section fields that changed since the last save
+        try:
+            record = {}
+            for section, created_attr in self.created_attrs.items():
+                record[f"{section}_CREATED"] = getattr(self, created_attr).strftime(
+                    self.CSA_TIME_FORMAT
                 )
-            json_file.close()
+                record[f"{section}_LATEST_TITLE"] = self.last_title_dict[f'{section}_LATEST_TITLE']
+            self.state.update(record)
+            self.remember_lasttimes()
+            self.seen.commit()
+            self.http_cache.commit()
+            self.similarity.commit()
+            self.fingerprints.commit()
         except Exception as e:
             self.logger.error(f"ERROR-2: {e}")
 
-    ################## FILTER FOR ARTICLES  ####################
+    def rollback(self):
+        # Forget what a failed tick marked as handled, its articles are read as new next tick
+        self.seen.discard()
+        self.http_cache.discard()
+        titles, created = self.saved_lasttimes
+        self.last_title_dict.update(titles)
+        for attr, value in created.items():
+            setattr(self, attr, value)
 
-    def get_list(self, subdomain):
+    ################## FILTER FOR ARTICLES  ####################
 
-        results = []
+    def section_of(self, subdomain):
+        # Section a listing path belongs to, used as the metrics label
+        path = subdomain.split("?")[0]
+        for section, section_path in self.section_paths.items():
+            if section_path == path:
+                return section
+        return path
+
+    def read_listing(self, subdomain, cached: bool = True, render: bool = True):
+        # Cards of a listing page, as (cards, path, entry). cards is None when the page is
+        # unavailable or its cards match the last committed read; entry is what http_cache
+        # should keep once they are handled. render=False never starts the browser and
+        # returns no cards when only a render could read them.
+
+        section = self.section_of(subdomain)
+        url = f"{self.CSA_URL}/{subdomain}"
+        # the backfill crawler reads pages once, so it skips the validator cache
+        previous = self.http_cache.entries.get(subdomain, {}) if cached else {}
+        with STAGE_SECONDS.time(stage="fetch", section=section):
+            if cached:
+                r, entry = self.http_cache.get(subdomain, url)
+            else:
+                r, entry = session.get(url, timeout=30), {}
+        if r.status_code not in (200, 304):
+            self.logger.warning(f"{subdomain}: HTTP {r.status_code}")
+            return None, None, None
+
+        # cards read off the page itself can't change while the page doesn't, anything
+        # filled in by javascript or the listing endpoint has to be read again
+        if r.status_code == 304 and previous.get("path") in ("static", "embedded"):
+            return None, "unchanged", None
+
+        results, path = [], None
+        if r.status_code == 200:
+            # try to read the cards without a browser first
+            with STAGE_SECONDS.time(stage="parse", section=section):
+                results, path = extract_cards(
+                    r.text, self.CSA_URL, self.CSA_TIME_FORMAT, self.html_parser)
+        if not results and subdomain in self.listing_endpoints:
+            results, path = self.get_list_json(subdomain), "json"
+
+        if not results:
+            if not render:
+                return [], None, None
+            results, path = self.get_list_browser(subdomain), "browser"
+        if not results:
+            return results, path, None
+
+        entry.update(path=path, cards=cards_digest(results))
+        if entry["cards"] == previous.get("cards"):
+            return None, "unchanged", entry
+        return results, path, entry
+
+    def fetch_listing(self, subdomain, cached: bool = True):
+        # read_listing with the fetch path recorded, returns (cards, entry)
+
+        section = self.section_of(subdomain)
+        try:
+            results, path, entry = self.read_listing(subdomain, cached)
+        # the caller decides what a failed section means for the tick
+        except Exception as e:
+            self.logger.error(f"{subdomain}: {e}")
+            raise
+
+        if path is not None:
+            self.fetch_path[subdomain] = path
+            FETCH_PATHS.inc(section=section, path=path)
+        if path == "unchanged":
+            # nothing changed since the last tick, skip the filter
+            self.logger.info(f"{subdomain}: unchanged since last check")
+        elif results is not None:
+            self.logger.info(f"{subdomain}: {len(results)} cards via {path}")
+        return results, entry
+
+    def get_list(self, subdomain, cached: bool = True):
+        # Cards of a listing page, None when unchanged or unavailable; the validators are kept
+        # straight away, main.fetch_section keeps them only once the section succeeded
+
+        results, entry = self.fetch_listing(subdomain, cached)
+        if cached and entry:
+            self.http_cache.keep(subdomain, entry)
+        return results
+
+    def probe_listings(self):
+        # Cheap check of every listing, True if the cards of any of them changed. Listings only
+        # the browser can read are left to their next tick, which always renders them.
+        for section_path in self.section_paths.values():
+            if self.http_cache.entries.get(section_path, {}).get("path") == "browser":
+                continue
+            try:
+                results, _, _ = self.read_listing(section_path, render=False)
+                if results:
+                    return True
+            except Exception as e:
+                self.logger.warning(f"{section_path}: probe failed, {e}")
+        return False
+
+    def new_articles(self):
+        # This tick's filtered articles per section
+        return {
+            self.tup_type[0]: self.new_alerts,
+            self.tup_type[1]: self.new_advs,
+            self.tup_type[2]: self.new_bullet,
+        }
+
+    def clustered_articles(self):
+        # This tick's articles with near-duplicates merged into the most urgent one of each cluster
+
+        new = self.new_articles()
+        if not self.dedupe_days:
+            return new
+        with STAGE_SECONDS.time(stage="cluster", section="all"):
+            kept, dropped = self.similarity.cluster(new)
+        for section, articles in new.items():
+            merged = len(articles) - len(kept[section])
+            if merged:
+                ARTICLES.inc(merged, section=section, outcome="duplicate")
+        if dropped:
+            self.logger.info(f"{dropped} articles already notified on an earlier tick")
+        return kept
+
+    def revised_articles(self):
+        # This tick's revised articles per section, diffed by track_revisions
+        return {section: self.revised.get(section, []) for section in self.tup_type}
+
+    async def track_revisions(self):
+        # Diff the revised articles against their fingerprints and fingerprint the new ones
+
+        if not self.track_updates_days:
+            return
+        revised = [obj for articles in self.revised_articles().values() for obj in articles]
+        if revised and self.enrich_details:
+            # only the revised articles' detail pages are fetched again, conditionally
+            self.enricher.product_matcher = self.product_matcher
+            await self.enricher.enrich(revised)
+
+        for obj in revised:
+            changes = self.fingerprints.revised(obj) or {}
+            changes.update(self.fingerprints.detail_changes(obj))
+            obj["changes"] = changes
+            # a revision is queued next to the original notification, not in place of it
+            obj["outbox_key"] = f"{obj['csa']}#{fingerprint(obj)}"
+            self.fingerprints.record(obj)
+            self.logger.info(f"Revised: {obj['title']} ({', '.join(changes)})")
+        for obj in self.new_alerts + self.new_advs + self.new_bullet:
+            self.fingerprints.record(obj)
+
+    def get_list_json(self, subdomain):
+        # Fetch the JSON endpoint that fills the cards, an empty list falls through to the browser
         try:
-            r = requests.get(f"{self.CSA_URL}/{subdomain}")
+            r = session.get(self.listing_endpoints[subdomain], timeout=30)
             if r.status_code == 200:
+                return cards_from_json(r.json(), self.CSA_URL, self.CSA_TIME_FORMAT)
+        except ValueError as e:
+            self.logger.warning(f"{subdomain}: bad listing json, {e}")
+        return []
 
-                options = webdriver.ChromeOptions()
+    def get_list_browser(self, subdomain):
+        # Render the listing in headless chrome, used only when the fast paths found nothing
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
 
-                # run the browser in headless mode (without GUI)
-                options.add_argument('--headless')
-
-                driver = webdriver.Chrome(options=options)
-                driver.get(f"{self.CSA_URL}/{subdomain}")
+        results = []
+        section = self.section_of(subdomain)
+        pool = self.pool or browser_pool(max_tabs=1)
+        try:
+            with pool.tab() as driver:
+                with STAGE_SECONDS.time(stage="page_load", section=section):
+                    driver.get(f"{self.CSA_URL}/{subdomain}")
                 # looking for the date, since it is one of the elements that renders along with javascript
-                element = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, 'm-card-article__note')))
-
-                if element:
-                    soup = BeautifulSoup(driver.page_source, "lxml")
-                    for elem in soup.select("a.m-card-article"):
-                        # if there is a link href for each section for m-card-article, assume that there is a report for publishing
-                        if elem.get('href'):
-                            result = {}
-                            result["csa"] = f"{self.CSA_URL}{elem.get('href')}"
-                            result["title"] = elem.find(
-                                'div', class_="m-card-article__title truncate-3-lines").get_text(" ", strip=True)
-                            result["description"] = elem.find(
-                                'div', class_="m-card-article__desc truncate-3-lines").get_text(" ", strip=True)
-                            result["created"] = elem.find(
-                                'div', class_="m-card-article__note").get_text(" ", strip=True)
-                            results.append(result)
-
-                driver.quit()
-                return results
-        except (HTTPException, ConnectionError) as e:
-            self.logger.error(f"{e}")
-            sys.exit(1)
-
-        except Exception as e:
-            self.logger.error(f"{e}")
-            sys.exit(1)
+                with STAGE_SECONDS.time(stage="card_wait", section=section):
+                    element = WebDriverWait(driver, min(20, self.section_timeout)).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, 'm-card-article__note')))
+
+                with STAGE_SECONDS.time(stage="parse", section=section):
+                    if element and self.browser_extraction == "script":
+                        results = cards_from_driver(driver, self.CSA_URL)
+                    elif element:
+                        results = HTML_PARSERS[self.html_parser](
+                            driver.page_source, self.CSA_URL)
+        finally:
+            if pool is not self.pool:
+                pool.close()
+        return results
 
     def filterlist(self, listobj: list, last_create: datetime.datetime, type: str):
 
         filtered_objlist = []
         new_last_time = last_create
+        self.revised[type] = []
+
+        # unchanged or unreachable listing, keep the saved state as it is
+        if not listobj:
+            self.published[type] = 0
+            return filtered_objlist, new_last_time
+
         first_article = True
         first_title = ''
 
+        # no history for this section yet, migrate from the record.json title/date watermark
+        bootstrap = not self.seen.has_section(type)
+        past_last_title = False
+        started = time.perf_counter()
+        match_seconds = 0.0
+        published = 0
+
         for obj in listobj:
             if first_article:
                 first_title = obj['title']
                 first_article = False
 
-            # if first element title is found in any of the latest title, it will break out of loop since there's nothing to update
-            if (obj['title'] in self.last_title_dict.values()):
-                break
-
-            obj_time = datetime.datetime.strptime(
-                f"{obj['created']}", self.CSA_TIME_FORMAT)
-
-            if obj_time >= last_create:
-                if self.valid or self.is_summ_keyword_present(obj["description"]):
-                    filtered_objlist.append(obj)
-
-            if obj_time > new_last_time:
-                new_last_time = obj_time
+            if bootstrap:
+                # everything from the saved latest title down was handled by the old watermark
+                past_last_title = past_last_title or obj.title in self.last_title_dict.values()
+                is_new = not past_last_title and obj.created_at >= last_create
+            else:
+                is_new = not self.seen.seen(obj)
+
+            obj.section = type
+            self.seen.add(type, obj)
+            if not is_new:
+                ARTICLES.inc(section=type, outcome="seen")
+                # one fingerprint comparison per card, nothing is fetched unless it differs
+                if self.track_updates_days and self.fingerprints.revised(obj):
+                    routes = self.subscribers.route(obj, type)
+                    if routes:
+                        obj["routes"] = routes
+                        self.revised[type].append(obj)
+                        ARTICLES.inc(section=type, outcome="revised")
+                continue
+            published += 1
+
+            # every subscriber is matched in one pass, see subscribers.subscriber_index
+            match_started = time.perf_counter()
+            routes = self.subscribers.route(obj, type)
+            match_seconds += time.perf_counter() - match_started
+            if routes:
+                obj["routes"] = routes
+                filtered_objlist.append(obj)
+                ARTICLES.inc(section=type, outcome="new")
+            else:
+                ARTICLES.inc(section=type, outcome="no_keyword")
+
+            if obj.created_at > new_last_time:
+                new_last_time = obj.created_at
 
         self.last_title_dict[f'{type}_LATEST_TITLE'] = first_title
+        self.published[type] = published
 
+        STAGE_SECONDS.observe(time.perf_counter() - started,
+                              stage="filter", section=type)
+        STAGE_SECONDS.observe(match_seconds, stage="match", section=type)
         return filtered_objlist, new_last_time
 
-    def is_summ_keyword_present(self, summary: str):
-        # Given the summary check if any keyword is present
+    ################## ENRICH ARTICLES  ####################
+
+    async def enrich_new_articles(self):
+        # Add CVE IDs, products and severity from the detail pages of this tick's articles
+
+        if not self.enrich_details:
+            return
+        self.enricher.product_matcher = self.product_matcher
+        await self.enricher.enrich(self.new_alerts + self.new_advs + self.new_bullet)
+
+    async def expand_new_bulletins(self):
+        # Read the vulnerability table of this tick's bulletins and give every subscriber the
+        # entries naming one of its products (all of them for ALL_VALID subscribers). A bulletin
+        # only goes to the subscribers left with an entry, and is not posted if there are none.
+
+        if not self.bulletin_entries or not self.new_bullet:
+            return
+        section = self.tup_type[2]
+        with STAGE_SECONDS.time(stage="bulletin", section=section):
+            await expand_bulletins(self.new_bullet, self.bulletin_min_cvss, self.enricher.max_parallel)
+
+        kept = []
+        for obj in self.new_bullet:
+            # not read, or no table to read, the bulletin goes out as it is
+            if not obj.get("entries_total"):
+                kept.append(obj)
+                continue
+            routes, route_fields = {}, {}
+            for name, words in obj["routes"].items():
+                member = self.subscribers.by_name[name]
+                selected = select_entries(
+                    obj["entries"], product_matcher=None if member.all_valid else member.product_matcher)
+                if selected:
+                    routes[name] = words
+                    route_fields[name] = {"entries": selected[:self.bulletin_max_entries],
+                                          "entries_matched": len(selected)}
+            if not routes:
+                self.logger.info(
+                    f"{obj['title']}: none of {obj['entries_total']} entries passed the filter")
+                ARTICLES.inc(section=section, outcome="no_entries")
+                continue
+            obj["routes"] = routes
+            obj["route_fields"] = route_fields
+            kept.append(obj)
+        # in place, new_bullet_title is a view over this list
+        self.new_bullet[:] = kept
+
+    def add_detail_fields(self, embed: Embed, obj: dict):
+        # Matched keywords and enrichment fields, when the article has them
+
+        if obj.get("severity"):
+            embed.add_field(
+                name=f"⚠️  *Severity*", value=obj["severity"], inline=True
+            )
+        # bulletin entries already list their CVE IDs
+        if obj.get("cves") and not obj.get("entries"):
+            embed.add_field(
+                name=f"🐞  *CVEs*", value=", ".join(obj["cves"])[:1024], inline=False
+            )
+        if obj.get("products"):
+            embed.add_field(
+                name=f"📦  *Affected Products*", value="\n".join(obj["products"])[:1024], inline=False
+            )
+        if obj.get("keywords"):
+            embed.add_field(
+                name=f"🔑  *Keywords*", value=", ".join(obj["keywords"])[:1024], inline=False
+            )
+        if obj.get("related"):
+            related = "\n".join(
+                f"{item['section'].title()}: [{item['title']}]({item['csa']})" for item in obj["related"])
+            embed.add_field(
+                name=f"🔗  *Also Published As*", value=related[:1024], inline=False
+            )
+
+    def generate_updated_message(self, section: str, obj: dict) -> Embed:
+        # What changed in an article since it was first posted
+        from discord import Embed
 
-        return any(w in summary for w in self.keywords) or any(
-            w.lower() in summary.lower() for w in self.keywords_i
-        )  # for each of the word in description keyword config, check if it exists in summary.
+        embed = Embed(
+            title=f"♻️ *Updated: {obj['title']}*"[:256],
+            description=f"Revised on the {section.title()} page after it was posted.",
+            timestamp=datetime.datetime.now(),
+            color=self.section_colors[section],
+        )
+        embed.add_field(
+            name=f"📅  *Published*", value=f"{obj['created']}", inline=True
+        )
+        for field, (old, new) in obj["changes"].items():
+            embed.add_field(
+                name=f"✏️  *{field.title()}*", value=render_change(old, new), inline=False
+            )
+        embed.add_field(
+            name=f"More Information",
+            value=f"{obj['csa']}",
+            inline=False,
+        )
+        return embed
+
+    def generate_digest_messages(self, section: str, articles: list):
+        # Compact digest embeds for a group of articles, returned with the articles on each page
+
+        from discord import Embed
+
+        pages = paginate(articles)
+        messages = []
+        for number, page in enumerate(pages, start=1):
+            title = f"🗞️ *{len(articles)} new CSA {section.title()}*"
+            if len(pages) > 1:
+                title += f" ({number}/{len(pages)})"
+            embed = Embed(
+                title=title,
+                description="\n".join(line for _, line in page),
+                timestamp=datetime.datetime.now(),
+                color=self.section_colors[section],
+            )
+            messages.append((embed, [article for article, _ in page]))
+        return messages
 
     ################## GET ALERTS FROM CSA  ####################
 
     def get_new_alerts(self):
 
-        alerts = self.get_list("alerts-advisories/alerts")
+        self.filter_new_alerts(self.get_list(
+            self.section_paths[self.tup_type[0]]))
+
+    def filter_new_alerts(self, alerts):
+
         self.new_alerts, self.ALERT_CREATED = self.filterlist(
             alerts, self.ALERT_CREATED, self.tup_type[0]
         )
 
-        self.new_alerts_title = [new_alert["title"]
-                                 for new_alert in self.new_alerts]
+        self.new_alerts_title = title_view(self.new_alerts)
         self.logger.info(f"CSA Alerts: {self.new_alerts_title}")
 
     def generate_new_alert_message(self, new_alerts) -> Embed:
         # Generate new CVE message for sending to discord
+        from discord import Embed
+
         embed = Embed(
             title=f"🔈 *{new_alerts['title']}*",
             description=new_alerts["description"]
             if len(new_alerts["description"]) < 500
             else new_alerts["description"][:500] + "...",
             timestamp=datetime.datetime.now(),
-            color=Color.brand_red(),
+            color=self.section_colors[self.tup_type[0]],
         )
         embed.add_field(
             name=f"📅  *Published*", value=f"{new_alerts['created']}", inline=True
@@ -226,6 +742,7 @@ class csa_report:
             value=f"{new_alerts['csa']}",
             inline=False,
         )
+        self.add_detail_fields(embed, new_alerts)
 
         return embed
 
@@ -233,23 +750,29 @@ class csa_report:
 
     def get_new_advs(self):
 
-        adv = self.get_list("alerts-advisories/Advisories")
+        self.filter_new_advs(self.get_list(
+            self.section_paths[self.tup_type[1]]))
+
+    def filter_new_advs(self, adv):
+
         self.new_advs, self.ADV_CREATED = self.filterlist(
             adv, self.ADV_CREATED, self.tup_type[1]
         )
 
-        self.new_advs_title = [new_adv["title"] for new_adv in self.new_advs]
+        self.new_advs_title = title_view(self.new_advs)
         self.logger.info(f"CSA Advisories: {self.new_advs_title}")
 
     def generate_new_adv_message(self, new_advs) -> Embed:
         # Generate new CVE message for sending to discord
+        from discord import Embed
+
         embed = Embed(
             title=f"🔈 *{new_advs['title']}*",
             description=new_advs["description"]
             if len(new_advs["description"]) < 500
             else new_advs["description"][:500] + "...",
             timestamp=datetime.datetime.now(),
-            color=Color.blue(),
+            color=self.section_colors[self.tup_type[1]],
         )
         embed.add_field(
             name=f"📅  *Published*", value=f"{new_advs['created']}", inline=True
@@ -259,6 +782,7 @@ class csa_report:
             value=f"{new_advs['csa']}",
             inline=False,
         )
+        self.add_detail_fields(embed, new_advs)
 
         return embed
 
@@ -266,32 +790,52 @@ class csa_report:
 
     def get_new_bulletin(self):
 
-        bullet = self.get_list("alerts-advisories/security-bulletins")
+        self.filter_new_bulletin(self.get_list(
+            self.section_paths[self.tup_type[2]]))
+
+    def filter_new_bulletin(self, bullet):
+
         self.new_bullet, self.BULLET_CREATED = self.filterlist(
             bullet, self.BULLET_CREATED, self.tup_type[2]
         )
 
-        self.new_bullet_title = [new_bullet["title"]
-                                 for new_bullet in self.new_bullet]
+        self.new_bullet_title = title_view(self.new_bullet)
         self.logger.info(f"CSA Bulletins: {self.new_bullet_title}")
 
     def generate_new_bulletin_message(self, new_bullet) -> Embed:
         # Generate new CVE message for sending to discord
+        from discord import Embed
+
+        if new_bullet.get("entries"):
+            # filled in last, with whatever room the fields leave
+            description = ""
+        elif len(new_bullet["description"]) < 500:
+            description = new_bullet["description"]
+        else:
+            description = new_bullet["description"][:500] + "..."
         embed = Embed(
             title=f"🔈 *{new_bullet['title']}*",
-            description=new_bullet["description"]
-            if len(new_bullet["description"]) < 500
-            else new_bullet["description"][:500] + "...",
+            description=description,
             timestamp=datetime.datetime.now(),
-            color=Color.yellow(),
+            color=self.section_colors[self.tup_type[2]],
         )
         embed.add_field(
             name=f"📅  *Published*", value=f"{new_bullet['created']}", inline=True
         )
+        if new_bullet.get("entries"):
+            embed.add_field(
+                name=f"🧾  *Matching Entries*",
+                value=f"{new_bullet['entries_matched']} of {new_bullet['entries_total']}", inline=True
+            )
         embed.add_field(
             name=f"More Information",
             value=f"{new_bullet['csa']}",
             inline=False,
         )
+        self.add_detail_fields(embed, new_bullet)
+        if new_bullet.get("entries"):
+            # only the table entries that passed the CVSS and product filters
+            embed.description = entries_description(
+                new_bullet, min(4000, MAX_EMBED_CHARS - len(embed)))
 
         return embed
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+
+from metrics import STAGE_SECONDS, WEBHOOK_POSTS
+
+# Discord webhook limits for a single message
+MAX_EMBEDS = 10
+MAX_CHARS = 6000
+
+
+def pack_embeds(embeds: list):
+    # Group embeds, in order, into as few webhook posts as the limits allow
+
+    batches = []
+    batch = []
+    size = 0
+    for embed in embeds:
+        embed_size = len(embed)
+        if batch and (len(batch) == MAX_EMBEDS or size + embed_size > MAX_CHARS):
+            batches.append(batch)
+            batch = []
+            size = 0
+        batch.append(embed)
+        size += embed_size
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class delivery_queue:
+    # Non-blocking webhook delivery. Posts are queued and sent by max_in_flight
+    # workers; a 429 or an exhausted rate-limit bucket pauses every worker until
+    # Discord's reset time, other failures back off with jittered exponential
+    # delay. submit() never waits, so work keeps coming in while workers sleep.
+    # One worker keeps posts in the order they were submitted, retries
+    # included; the webhook's bucket serialises posts to it anyway.
+
+    def __init__(self, webhookurl: str, session: aiohttp.ClientSession, max_in_flight: int = 1,
+                 max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 300.0):
+
+        self.webhookurl = webhookurl
+        self.session = session
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.logger = logging.getLogger("__main__")
+
+        self.queue = asyncio.Queue()
+        self.workers = []
+        # monotonic time before which nothing may be posted (shared rate-limit bucket)
+        self.resume_at = 0.0
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.latencies = []
+
+    def start(self):
+        for _ in range(self.max_in_flight):
+            self.workers.append(asyncio.create_task(self._worker()))
+
+    def submit(self, embeds: list, on_delivered=None, on_rejected=None):
+        # Queue one webhook post. on_delivered(positions) runs with the positions of the embeds
+        # Discord accepted, on_rejected(positions, status) with those it refused outright
+        self.queue.put_nowait((embeds, on_delivered, on_rejected, time.monotonic()))
+
+    async def join(self):
+        await self.queue.join()
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "p50_seconds": latencies[len(latencies) // 2] if latencies else 0.0,
+            "max_seconds": latencies[-1] if latencies else 0.0,
+        }
+
+    def backoff(self, attempt: int):
+        # full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def retry_after(self, body: dict, headers, attempt: int):
+        # Seconds to wait after a 429: Discord's retry_after, then the Retry-After header, then backoff
+        for value in (body.get("retry_after"), headers.get("Retry-After")):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                continue
+        return self.backoff(attempt)
+
+    async def _worker(self):
+        while True:
+            embeds, on_delivered, on_rejected, queued_at = await self.queue.get()
+            try:
+                batch_status = await self._deliver(embeds, queued_at)
+                if batch_status == 400 and len(embeds) > 1:
+                    # one bad embed must not hold back the rest of its batch
+                    self.logger.warning(f"Posting the {len(embeds)} embeds of the rejected batch one at a time")
+                    statuses = [await self._deliver([embed], queued_at) for embed in embeds]
+                else:
+                    statuses = [batch_status] * len(embeds)
+
+                delivered = [position for position, status in enumerate(statuses)
+                             if status is not None and status < 300]
+                if delivered and on_delivered:
+                    on_delivered(delivered)
+                for rejected_status in sorted({status for status in statuses if status and status >= 300}):
+                    if on_rejected:
+                        on_rejected([position for position, status in enumerate(statuses)
+                                     if status == rejected_status], rejected_status)
+            except Exception as e:
+                self.failed += 1
+                self.logger.error(f"Webhook delivery crashed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _wait_for_bucket(self):
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _post(self, embeds: list):
+        url = f"{self.webhookurl}{'&' if '?' in self.webhookurl else '?'}wait=true"
+        with STAGE_SECONDS.time(stage="webhook_send", section="all"):
+            async with self.session.post(url, json={"embeds": [e.to_dict() for e in embeds]}) as resp:
+                body = {}
+                if resp.status == 429:
+                    try:
+                        body = await resp.json(content_type=None)
+                    # a proxy's html error page rather than Discord's json
+                    except ValueError:
+                        body = {}
+                    if not isinstance(body, dict):
+                        body = {}
+                else:
+                    await resp.read()
+        WEBHOOK_POSTS.inc(status=str(resp.status))
+        return resp.status, resp.headers, body
+
+    def _pause(self, seconds: float):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    async def _deliver(self, embeds: list, queued_at: float):
+        # Post with retries, returns the final HTTP status, None when every attempt failed
+        for attempt in range(self.max_attempts):
+            await self._wait_for_bucket()
+            try:
+                status, headers, body = await self._post(embeds)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.warning(f"Webhook post failed: {e}")
+                status, headers, body = None, {}, {}
+
+            if status is not None and status < 300:
+                # bucket used up, hold the other workers until it resets
+                if headers.get("X-RateLimit-Remaining") == "0":
+                    self._pause(float(headers.get("X-RateLimit-Reset-After", 0)))
+                self.sent += 1
+                self.latencies.append(time.monotonic() - queued_at)
+                return status
+
+            if status == 429:
+                self.rate_limited += 1
+                self._pause(self.retry_after(body, headers, attempt) + random.uniform(0, 0.25))
+            elif status is None or status >= 500:
+                self._pause(self.backoff(attempt))
+            else:
+                self.failed += 1
+                self.logger.error(f"Webhook rejected post: HTTP {status}")
+                return status
+            self.retries += 1
+
+        self.failed += 1
+        self.logger.error(
+            f"Webhook post dropped after {self.max_attempts} attempts")
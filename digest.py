@@ -0,0 +1,37 @@
+# Discord limits for one digest embed
+MAX_DESCRIPTION = 4096
+MAX_TITLE_CHARS = 200
+
+
+def digest_line(article: dict):
+    title = article["title"]
+    if len(title) > MAX_TITLE_CHARS:
+        title = title[:MAX_TITLE_CHARS] + "..."
+    line = f"• [{title}]({article['csa']}) · {article['created']}"
+    if article.get("severity"):
+        line += f" · {article['severity']}"
+    if article.get("entries"):
+        line += f" · {article['entries_matched']} matching CVEs"
+    if article.get("related"):
+        sections = sorted({item["section"].title() for item in article["related"]})
+        line += f" · also in {', '.join(sections)}"
+    return line
+
+
+def paginate(articles: list, max_items: int = 15, max_chars: int = MAX_DESCRIPTION - 96):
+    # Split articles, in order, into pages that each fit one digest embed description
+    pages = []
+    page = []
+    size = 0
+    for article in articles:
+        line = digest_line(article)
+        if page and (len(page) == max_items or size + len(line) + 1 > max_chars):
+            pages.append(page)
+            page = []
+            size = 0
+        page.append((article, line))
+        size += len(line) + 1
+
+    if page:
+        pages.append(page)
+    return pages
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import TYPE_CHECKING
+
+import lxml.html
+from lxml import etree
+
+# aiohttp is only loaded once there are articles to enrich
+if TYPE_CHECKING:
+    import aiohttp
+
+CVE_PATTERN = re.compile(r"\bCVE-\d{4}-\d{4,7}\b", re.I)
+SEVERITY_PATTERN = re.compile(
+    r"\b(?:severity|risk)(?:\s+(?:level|rating))?\s*[:\-]?\s*(critical|high|medium|moderate|low)\b", re.I)
+CVSS_PATTERN = re.compile(r"\bCVSS(?:v3(?:\.\d)?)?[^0-9]{0,30}(\d{1,2}\.\d)\b", re.I)
+TITLE_SEVERITY_PATTERN = re.compile(r"^(critical|high|medium|low)\b", re.I)
+AFFECTED_PATTERN = re.compile(r"affected\s+(?:products?|versions?|systems?)", re.I)
+
+MAX_PRODUCTS = 20
+
+
+def cvss_severity(score: float):
+    # CVSS v3 qualitative rating
+    if score >= 9.0:
+        return "Critical"
+    if score >= 7.0:
+        return "High"
+    if score >= 4.0:
+        return "Medium"
+    return "Low"
+
+
+def parse_detail(html: str, title: str = "", product_matcher=None):
+    # Pull CVE IDs, affected products and severity out of an article page
+    doc = lxml.html.fromstring(html)
+    for node in doc.xpath("//script|//style|//noscript"):
+        node.drop_tree()
+    text = " ".join(" ".join(doc.itertext()).split())
+
+    cves = sorted({cve.upper() for cve in CVE_PATTERN.findall(text)})
+
+    # list items under an "Affected products" style heading, plus any configured product names
+    products = []
+    for heading in doc.xpath("//h1|//h2|//h3|//h4|//h5|//p|//strong"):
+        if not AFFECTED_PATTERN.search(heading.text_content()):
+            continue
+        for sibling in heading.itersiblings():
+            if sibling.tag in ("h1", "h2", "h3", "h4", "h5"):
+                break
+            products += [" ".join(li.text_content().split())
+                         for li in sibling.iter("li")]
+        if products:
+            break
+    if product_matcher is not None:
+        products += [p for p in product_matcher.matches(text)
+                     if p not in products]
+
+    severity = None
+    match = SEVERITY_PATTERN.search(text) or TITLE_SEVERITY_PATTERN.search(title)
+    if match:
+        severity = match.group(1).capitalize().replace("Moderate", "Medium")
+    else:
+        scores = [float(score) for score in CVSS_PATTERN.findall(text)
+                  if float(score) <= 10.0]
+        if scores:
+            severity = cvss_severity(max(scores))
+
+    return {"cves": cves, "products": products[:MAX_PRODUCTS], "severity": severity}
+
+
+class detail_cache:
+    # On-disk cache of article pages keyed by URL, revalidated with ETag/Last-Modified
+
+    def __init__(self, path: str):
+
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, url: str):
+        return os.path.join(self.path, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str):
+        try:
+            with open(self._file(url), "r") as cache_file:
+                return json.load(cache_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, url: str, entry: dict):
+        tmp_path = self._file(url) + ".tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(tmp_path, self._file(url))
+
+
+class article_enricher:
+    # Fetches the detail page of every new article concurrently over one session
+    # and adds "cves", "products" and "severity" to the article.
+
+    def __init__(self, cache_path: str, product_matcher=None, max_parallel: int = 4, timeout: int = 30):
+
+        self.cache = detail_cache(cache_path)
+        self.product_matcher = product_matcher
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+        self.logger = logging.getLogger("__main__")
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str):
+        # Return (page, changed), a 304 is answered from the cache
+        import aiohttp
+
+        entry = self.cache.get(url)
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+            if resp.status == 304 and entry:
+                return entry, False
+            resp.raise_for_status()
+            body = await resp.text()
+
+        changed = entry is None or entry.get("body") != body
+        entry = {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "body": body,
+            "details": entry.get("details") if entry and not changed else None,
+        }
+        return entry, changed
+
+    async def enrich_one(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, article: dict):
+        import aiohttp
+
+        async with semaphore:
+            try:
+                entry, changed = await self.fetch(session, article["csa"])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.warning(f"Detail page not fetched, {article['csa']}: {e}")
+                return
+        # parsed fields are cached with the page, so an unchanged page is not parsed again
+        if changed or not entry.get("details"):
+            try:
+                entry["details"] = parse_detail(
+                    entry["body"], article.get("title", ""), self.product_matcher)
+            # an empty or comment-only page, the article goes out without details
+            except (etree.ParserError, ValueError) as e:
+                self.logger.warning(f"Detail page not parsed, {article['csa']}: {e}")
+                return
+            self.cache.put(article["csa"], entry)
+        article.update(entry["details"])
+
+    async def enrich(self, articles: list, session: aiohttp.ClientSession = None):
+        if not articles:
+            return
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                await asyncio.gather(*(self.enrich_one(session, semaphore, a) for a in articles))
+        else:
+            await asyncio.gather(*(self.enrich_one(session, semaphore, a) for a in articles))
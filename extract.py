@@ -0,0 +1,212 @@
+import datetime
+import json
+import re
+
+import lxml.html
+
+from article import TIME_FORMAT, article
+
+# Card extraction helpers shared by the browser-free path and the Selenium
+# fallback in csa_report.get_list. Everything in here works on plain strings
+# or decoded JSON so it can be exercised against saved pages offline.
+
+CARD_SELECTOR = "a.m-card-article"
+
+# keys seen in the JSON that backs the listing cards (and the usual CMS spellings)
+TITLE_KEYS = ("title", "name", "headline")
+DESC_KEYS = ("description", "desc", "summary", "teaser")
+DATE_KEYS = ("created", "date", "publishedDate", "published_date",
+             "datePublished", "publishDate", "postedDate")
+LINK_KEYS = ("href", "url", "link", "path")
+
+DATE_FORMATS = ("%d %b %Y", "%d %B %Y", "%Y-%m-%d", "%d/%m/%Y")
+
+# same cards as CARD_SELECTOR, for lxml
+CARD_XPATH = "//a[contains(concat(' ', normalize-space(@class), ' '), ' m-card-article ')][@href]"
+CARD_PART_XPATH = ".//*[contains(concat(' ', normalize-space(@class), ' '), ' m-card-article__{} ')]"
+
+# collects the cards inside the page, so the rendered DOM never has to be serialised
+CARD_SCRIPT = """
+return Array.from(document.querySelectorAll('a.m-card-article[href]')).map(function (card) {
+    function text(part) {
+        var el = card.querySelector('.m-card-article__' + part);
+        return el ? el.textContent.replace(/\\s+/g, ' ').trim() : null;
+    }
+    return {href: card.getAttribute('href'), title: text('title'),
+            description: text('desc'), created: text('note')};
+});
+"""
+
+EMBEDDED_SCRIPT = re.compile(
+    r'<script[^>]+type="application/(?:ld\+)?json"[^>]*>(.*?)</script>', re.S
+)
+
+
+def normalise_date(value, time_format: str):
+    # Return the date in time_format (CSA_TIME_FORMAT) or None if it can't be read
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        return datetime.datetime.fromisoformat(
+            value.replace("Z", "+00:00")).strftime(time_format)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).strftime(time_format)
+        except ValueError:
+            continue
+    return None
+
+
+def new_article(base_url: str, link: str, title: str, description: str, created: str,
+                time_format: str = TIME_FORMAT):
+    # Article record for a card, None when its date can't be read in any known format
+    created = created if _parses(created, time_format) else normalise_date(created, time_format)
+    if created is None:
+        return None
+    return article(absolute_link(base_url, link), title, description, created, time_format=time_format)
+
+
+def _parses(value: str, time_format: str):
+    try:
+        datetime.datetime.strptime(value, time_format)
+        return True
+    except ValueError:
+        return False
+
+
+def absolute_link(base_url: str, link: str):
+    if link.startswith("http"):
+        return link
+    return f"{base_url}{link if link.startswith('/') else '/' + link}"
+
+
+def _text(tag):
+    # Text of a tag with runs of whitespace collapsed, like the lxml and in-page backends
+    return " ".join(tag.get_text(" ").split())
+
+
+def cards_from_html(html: str, base_url: str):
+    # Parse a.m-card-article cards, either server-rendered or from the rendered DOM
+    from bs4 import BeautifulSoup
+
+    results = []
+    soup = BeautifulSoup(html, "lxml")
+    for elem in soup.select(CARD_SELECTOR):
+        # if there is a link href for each section for m-card-article, assume that there is a report for publishing
+        if elem.get('href'):
+            title = elem.select_one(".m-card-article__title")
+            desc = elem.select_one(".m-card-article__desc")
+            note = elem.select_one(".m-card-article__note")
+            # cards rendered without a date are placeholders waiting on javascript
+            if title is None or note is None:
+                continue
+            result = new_article(
+                base_url, elem.get('href'), _text(title), _text(desc) if desc else "", _text(note))
+            if result is not None:
+                results.append(result)
+    return results
+
+
+def cards_from_lxml(html: str, base_url: str):
+    # Same result as cards_from_html, parsed with lxml directly
+    results = []
+    if not html.strip():
+        return results
+    title_xpath, desc_xpath, note_xpath = (
+        CARD_PART_XPATH.format(part) for part in ("title", "desc", "note"))
+
+    def text(nodes):
+        return " ".join(nodes[0].text_content().split()) if nodes else None
+
+    for elem in lxml.html.fromstring(html).xpath(CARD_XPATH):
+        title = text(elem.xpath(title_xpath))
+        note = text(elem.xpath(note_xpath))
+        # cards rendered without a date are placeholders waiting on javascript
+        if title is None or note is None:
+            continue
+        result = new_article(base_url, elem.get('href'), title,
+                             text(elem.xpath(desc_xpath)) or "", note)
+        if result is not None:
+            results.append(result)
+    return results
+
+
+def cards_from_driver(driver, base_url: str):
+    # Collect the cards inside the rendered page with a single script call
+    results = []
+    for card in driver.execute_script(CARD_SCRIPT) or []:
+        if card.get("title") is None or card.get("created") is None:
+            continue
+        result = new_article(base_url, card["href"], card["title"],
+                             card.get("description") or "", card["created"])
+        if result is not None:
+            results.append(result)
+    return results
+
+
+# parsers for static or serialised html
+HTML_PARSERS = {"bs4": cards_from_html, "lxml": cards_from_lxml}
+
+
+def _card_from_mapping(obj: dict, base_url: str, time_format: str):
+    def first(keys):
+        for key in keys:
+            if isinstance(obj.get(key), str) and obj[key].strip():
+                return obj[key].strip()
+        return None
+
+    title, link, date = first(TITLE_KEYS), first(LINK_KEYS), first(DATE_KEYS)
+    created = normalise_date(date, time_format)
+    if not (title and link and created):
+        return None
+    from bs4 import BeautifulSoup
+
+    return article(absolute_link(base_url, link), title,
+                   BeautifulSoup(first(DESC_KEYS) or "", "lxml").get_text(" ", strip=True),
+                   created, time_format=time_format)
+
+
+def cards_from_json(payload, base_url: str, time_format: str):
+    # Walk decoded JSON and collect every object that looks like a listing card
+    results = []
+    seen = set()
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            card = _card_from_mapping(node, base_url, time_format)
+            if card and card["csa"] not in seen:
+                seen.add(card["csa"])
+                results.append(card)
+                continue
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return results
+
+
+def cards_from_embedded_data(html: str, base_url: str, time_format: str):
+    # Look for card data shipped inside the page (__NEXT_DATA__, ld+json, ...)
+    for block in EMBEDDED_SCRIPT.findall(html):
+        try:
+            payload = json.loads(block)
+        except ValueError:
+            continue
+        cards = cards_from_json(payload, base_url, time_format)
+        if cards:
+            return cards
+    return []
+
+
+def extract_cards(html: str, base_url: str, time_format: str, parser: str = "lxml"):
+    # Try every browser-free strategy on a listing page, returns (cards, path)
+    cards = HTML_PARSERS[parser](html, base_url)
+    if cards:
+        return cards, "static"
+    cards = cards_from_embedded_data(html, base_url, time_format)
+    if cards:
+        return cards, "embedded"
+    return [], None
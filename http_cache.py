@@ -0,0 +1,81 @@
+import hashlib
+import json
+import logging
+import os
+
+import requests
+
+# one keep-alive session for every listing request, across sections and ticks
+session = requests.Session()
+session.headers.update({"User-Agent": "discord_csa_reporter"})
+
+
+def cards_digest(cards: list):
+    # Fingerprint of the card data of a listing, whichever path read it
+    content = json.dumps([[card["csa"], card["title"], card["description"], card["created"]]
+                          for card in cards])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class http_cache:
+    # ETag/Last-Modified validators of the listing pages, keyed by subdomain,
+    # with the extraction path and a digest of the cards last read from each.
+    # A 304 or an identical page only says the HTML is the same, which tells
+    # nothing about cards filled in by javascript, so whether a listing
+    # changed is decided by the caller from its cards (see
+    # csa_report.read_listing). Entries are handed back with keep() once the
+    # cards were handled and are only written on commit(), so a tick that
+    # fails partway fetches the page again.
+
+    def __init__(self, path: str, timeout: int = 30):
+
+        self.path = path
+        self.timeout = timeout
+        self.logger = logging.getLogger("__main__")
+        self.entries = {}
+        self.pending = {}
+
+        try:
+            with open(self.path, "r") as json_file:
+                self.entries = json.load(json_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"http cache unreadable, starting empty: {e}")
+
+    def get(self, key: str, url: str):
+        # Conditional GET, returns (response, entry) where entry carries the new validators,
+        # or is a copy of the committed entry when the server answered 304
+        headers = {}
+        entry = self.entries.get(key, {})
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        r = session.get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return r, dict(entry)
+        return r, {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+
+    def keep(self, key: str, entry: dict):
+        # Hold an entry for the next commit, once the cards it describes were handled
+        self.pending[key] = entry
+
+    def discard(self):
+        # Drop the entries kept since the last commit, their pages are read again
+        self.pending = {}
+
+    def commit(self):
+        # Persist the entries kept since the last commit
+        if not self.pending:
+            return
+        self.entries.update(self.pending)
+        self.pending = {}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(self.entries, json_file)
+        os.replace(tmp_path, self.path)
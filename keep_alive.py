@@ -1,19 +1,27 @@
 from threading import Thread
 
-from flask import Flask
+from flask import Flask, Response
+
+import metrics
 
 app = Flask(__name__)
 
 
 @app.route("/", methods=["HEAD", "GET"])
-async def home():
+def home():
     return "Stayin Alive"
 
 
-def run():
-    app.run(host="0.0.0.0", port=8081)
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def run(host: str, port: int):
+    app.run(host=host, port=port)
 
 
-def keep_alive():
-    t = Thread(target=run)
+def keep_alive(host: str = "127.0.0.1", port: int = 8081):
+    # daemon, so it never keeps the process alive after the scheduler stops
+    t = Thread(target=run, args=(host, port), daemon=True)
     t.start()
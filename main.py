@@ -1,16 +1,34 @@
+import time
+
+# start of the import, for the startup metrics
+STARTED = time.perf_counter()
+
+import argparse
 import asyncio
+import datetime
 import logging
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from os.path import join
-from time import sleep
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from os.path import join, dirname
 from dotenv import load_dotenv
-import aiohttp
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+# aiohttp, apscheduler, flask (keep_alive) and the delivery queue are imported
+# where they are used, a one-shot run only loads what its path needs
+from adaptive import adaptive_poller
+from browser_pool import browser_pool
 from csa import csa_report
-from discord import Embed, HTTPException, Webhook
+from circuit import circuit_breaker
+from metrics import (CIRCUIT_OPEN, LAST_SUCCESS, SECTION_FAILURES, SECTION_SKIPPED, STAGE_SECONDS,
+                     STARTUP_SECONDS)
+from outbox import outbox
+
+if TYPE_CHECKING:
+    import aiohttp
 
 dotenv_path = join(dirname(__file__), ".env")
 load_dotenv(dotenv_path)
@@ -51,67 +69,451 @@ filelog.setFormatter(formatter)
 logger.addHandler(consolelog)
 logger.addHandler(filelog)
 
+# warm chrome sessions shared by every section and every tick, sized by the reporter's config
+pool = None
+
+# sections are scraped in worker threads so the event loop stays responsive
+executor = ThreadPoolExecutor(thread_name_prefix="csa-section")
+
+# filtered articles wait here until discord has accepted them
+article_outbox = outbox(join(dirname(__file__), "output/outbox.db"))
+drain_lock = asyncio.Lock()
+
+# sections that keep failing are skipped for a while instead of slowing every tick
+breaker = circuit_breaker()
+
 #################### SEND MESSAGES #########################
 
 
-async def send_discord_message(message: Embed):
-    """Send a message to the discord channel webhook"""
+async def send_discord_messages(webhookurl: str, messages: list, ids: list, session: "aiohttp.ClientSession"):
+    """Send embeds to one channel webhook, packed into as few posts as possible
 
-    discord_webhok_url = os.getenv("DISCORD_WEBHOOK_URL")
+    ids holds the outbox ids behind each embed (a digest covers several)
+    """
+    from delivery import pack_embeds
 
-    if not discord_webhok_url:
-        logger.error("DISCORD_WEBHOOK_URL wasn't configured in the secrets!")
-        return
+    # outbox ids travel with their batch so each one is marked sent on delivery
+    batches = pack_embeds(messages)
+    batch_ids = []
+    for batch in batches:
+        batch_ids.append(ids[:len(batch)])
+        ids = ids[len(batch):]
+
+    await sendtowebhook(webhookurl=webhookurl, content=batches, session=session, ids=batch_ids)
+
+
+async def sendtowebhook(webhookurl: str, content: list, session: "aiohttp.ClientSession", ids: list):
+    """Deliver batches of embeds through the rate-limit aware delivery queue
+
+    ids holds the outbox ids behind each embed of every batch. Articles whose
+    embed Discord refuses as a bad request are marked failed, any other
+    refusal (a deleted webhook, say) leaves them queued.
+    """
+    from delivery import delivery_queue
+
+    def delivered(embed_ids, positions):
+        article_outbox.mark_sent([row_id for position in positions for row_id in embed_ids[position]])
+
+    def rejected(embed_ids, positions, status):
+        if status != 400:
+            return
+        row_ids = [row_id for position in positions for row_id in embed_ids[position]]
+        logger.error(f"Discord refused {len(row_ids)} articles, set aside as failed: {row_ids}")
+        article_outbox.mark_failed(row_ids, f"HTTP {status}")
+
+    queue = delivery_queue(webhookurl, session)
+    queue.start()
+    for batch, embed_ids in zip(content, ids):
+        queue.submit(batch, on_delivered=partial(delivered, embed_ids),
+                     on_rejected=partial(rejected, embed_ids))
+    try:
+        await queue.join()
+    finally:
+        await queue.close()
+    logger.info(f"Webhook delivery: {queue.stats()}")
+
+
+async def drain_outbox(csa: csa_report):
+    """Deliver every unsent article in the outbox, without touching the listings
+
+    Returns how many of the articles it tried to send are still unsent, counting
+    every article of a subscriber without a webhook
+    """
+
+    # a tick and the startup resume must not pick up the same rows
+    async with drain_lock:
+        return await _drain_outbox(csa)
+
+
+async def _drain_outbox(csa: csa_report):
+    rows = article_outbox.pending()
+    if not rows:
+        return 0
+
+    by_subscriber = {}
+    for row_id, section, subscriber, article, queued_at in rows:
+        by_subscriber.setdefault(subscriber, []).append((row_id, section, article, queued_at))
+
+    webhooks = csa.subscribers.webhooks()
+    deliveries = []
+    unroutable = 0
+    for subscriber, subscriber_rows in by_subscriber.items():
+        if subscriber not in webhooks:
+            configured = csa.subscribers.by_name.get(subscriber)
+            logger.error(f"{configured.webhook_env} wasn't configured in the secrets!" if configured
+                         else f"Subscriber {subscriber} is no longer configured, its articles stay queued")
+            # nothing can be sent until the config is fixed, so they count as undelivered
+            unroutable += len(subscriber_rows)
+            continue
+        messages, ids = build_messages(csa, subscriber_rows)
+        if messages:
+            deliveries.append((webhooks[subscriber], messages, ids))
 
-    await sendtowebhook(webhookurl=discord_webhok_url, content=message)
+    if deliveries:
+        import aiohttp
 
+        # one session for every post of the run, every channel is sent to concurrently
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(send_discord_messages(webhookurl, messages, ids, session)
+                                   for webhookurl, messages, ids in deliveries))
+    article_outbox.purge()
 
-async def sendtowebhook(webhookurl: str, content: Embed):
-    async with aiohttp.ClientSession() as session:
-        try:
-            webhook = Webhook.from_url(webhookurl, session=session)
-            await webhook.send(embed=content)
+    tried = {row_id for _, _, ids in deliveries for embed_ids in ids for row_id in embed_ids}
+    return unroutable + len(tried.intersection(row[0] for row in article_outbox.pending()))
 
-        except HTTPException:
-            sleep(180)
-            await webhook.send(embed=content)
+
+def build_messages(csa: csa_report, rows: list):
+    """Embeds for one subscriber's pending rows, returns (messages, outbox ids behind each embed)"""
+
+    messages = []
+    ids = []
+    digests = {}
+    for row_id, section, article, queued_at in rows:
+        if article.get("changes"):
+            # revisions of already posted articles are never folded into a digest
+            with STAGE_SECONDS.time(stage="embed", section=section):
+                messages.append(csa.generate_updated_message(section, article))
+            ids.append([row_id])
+            continue
+        if section in csa.digest_sections:
+            digests.setdefault(section, []).append((row_id, article, queued_at))
+            continue
+        # urgent sections go out straight away, one embed per article
+        with STAGE_SECONDS.time(stage="embed", section=section):
+            messages.append(csa.message_builders[section](article))
+        ids.append([row_id])
+
+    now = time.time()
+    for section, items in digests.items():
+        # hold the section until its oldest article has waited out the window
+        held_until = items[0][2] + csa.digest_window * 60
+        if held_until > now:
+            schedule_digest(held_until)
+            continue
+
+        with STAGE_SECONDS.time(stage="embed", section=section):
+            if len(items) < csa.digest_min_items:
+                messages += [csa.message_builders[section](article)
+                             for _, article, _ in items]
+                ids += [[row_id] for row_id, _, _ in items]
+                continue
+            row_ids = {id(article): row_id for row_id, article, _ in items}
+            for embed, articles in csa.generate_digest_messages(section, [article for _, article, _ in items]):
+                messages.append(embed)
+                ids.append([row_ids[id(article)] for article in articles])
+    return messages, ids
+
+
+def schedule_digest(run_at: float):
+    """Drain the outbox again once a held digest window has passed"""
+
+    if scheduler is None:
+        # one-shot run, the digest goes out on a later run
+        return
+    run_date = datetime.datetime.fromtimestamp(run_at + 1, datetime.timezone.utc)
+    job = scheduler.get_job("digest")
+    if job is None or job.next_run_time.timestamp() > run_date.timestamp():
+        scheduler.add_job(resume_outbox, "date", run_date=run_date, id="digest",
+                          replace_existing=True, misfire_grace_time=None, coalesce=True)
 
 
 #################### MAIN BODY #########################
-async def itscheckintime():
 
-    csa = csa_report()
-    csa.load_lasttimes()
-    csa.get_new_alerts()
-    csa.get_new_advs()
-    csa.get_new_bulletin()
+# one reporter for the life of the process, built on the first tick
+reporter = None
+
+# created by serve(), one-shot runs have no scheduler
+scheduler = None
+
+# set up in adaptive mode, decides when the next tick runs
+poller = None
+
+
+def get_reporter():
+    """Return the long-lived reporter, picking up config changes since the last tick"""
+
+    global reporter, pool
+    if reporter is None:
+        reporter = csa_report()
+        pool = browser_pool(max_tabs=reporter.browser_tabs)
+        reporter.pool = pool
+        reporter.load_lasttimes()
+        ready = time.perf_counter() - STARTED
+        STARTUP_SECONDS.set(ready, phase="ready")
+        logger.info(f"Reporter ready {ready:.2f}s after start")
+    else:
+        reporter.reload_config()
+    return reporter
+
+
+async def fetch_section(csa: csa_report, section: str):
+    """Fetch one section listing within its time budget, returns (succeeded, listing)"""
+
+    if not breaker.allow(section):
+        SECTION_SKIPPED.inc(section=section)
+        logger.warning(f"{section}: skipped, circuit open")
+        return False, None
+
+    loop = asyncio.get_running_loop()
+    path = csa.section_paths[section]
+    try:
+        listing, entry = await asyncio.wait_for(
+            loop.run_in_executor(executor, csa.fetch_listing, path),
+            timeout=csa.section_timeout,
+        )
+    except Exception as e:
+        reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+        SECTION_FAILURES.inc(section=section, reason=reason)
+        backoff = breaker.failure(section)
+        CIRCUIT_OPEN.set(1 if backoff else 0, section=section)
+        logger.error(f"{section}: fetch failed ({reason}), {e!r}"
+                     + (f", skipping for {backoff / 60:.0f} min" if backoff else ""))
+        return False, None
+
+    # validators are only kept for a listing that was read in time, a late or failed
+    # render must not make the next tick think the page is unchanged
+    if entry:
+        csa.http_cache.keep(path, entry)
+    breaker.success(section)
+    CIRCUIT_OPEN.set(0, section=section)
+    return True, listing
+
+
+async def fetch_sections(csa: csa_report):
+    """Fetch every section concurrently off the event loop, then filter them; returns the sections that succeeded"""
+
+    sections = list(csa.sections)
+    results = await asyncio.gather(*(fetch_section(csa, section) for section in sections))
+
+    succeeded = []
+    for section, (ok, listing) in zip(sections, results):
+        # a failed section filters an empty listing, so its state stays as it was
+        csa.sections[section](listing)
+        if ok:
+            succeeded.append(section)
+            LAST_SUCCESS.set(time.time(), section=section)
+    return succeeded
 
-    for alert in csa.new_alerts:
-        alert_msg = csa.generate_new_alert_message(alert)
-        await send_discord_message(alert_msg)
 
-    for adv in csa.new_advs:
-        adv_msg = csa.generate_new_adv_message(adv)
-        await send_discord_message(adv_msg)
+async def itscheckintime():
+    """One check of every section, returns (sections that succeeded, articles left undelivered)"""
 
-    for bulletin in csa.new_bullet:
-        bullet_msg = csa.generate_new_bulletin_message(bulletin)
-        await send_discord_message(bullet_msg)
+    csa = get_reporter()
+    try:
+        succeeded = await fetch_sections(csa)
+        await csa.enrich_new_articles()
+        await csa.expand_new_bulletins()
+        await csa.track_revisions()
 
+        # articles are durable once in the outbox, so the new state can be saved straight away
+        for section, articles in csa.clustered_articles().items():
+            for subscriber, records in csa.subscribers.fan_out(articles).items():
+                article_outbox.add(section, records, subscriber)
+        for section, articles in csa.revised_articles().items():
+            for subscriber, records in csa.subscribers.fan_out(articles).items():
+                article_outbox.add(section, records, subscriber)
+    except Exception:
+        # this tick's articles may not be in the outbox, so they must not count as seen
+        csa.rollback()
+        raise
     csa.update_lasttimes()
 
-if __name__ == "__main__":
-    scheduler = AsyncIOScheduler(timezone="Asia/Singapore")
-    scheduler.add_job(
-        itscheckintime, "cron", day_of_week="mon-fri", hour="8-18/1"
+    if poller is not None:
+        for section in succeeded:
+            poller.record(section, csa.published.get(section, 0))
+        poller.save()
+
+    undelivered = await drain_outbox(csa)
+    LAST_SUCCESS.set(time.time(), section="tick")
+    return succeeded, undelivered
+
+
+async def resume_outbox():
+    """Send whatever a previous run left undelivered"""
+    await drain_outbox(get_reporter())
+
+
+#################### ADAPTIVE SCHEDULE #########################
+
+# every card of the first pass over a section is seen within this many seconds
+BOOTSTRAP_SECONDS = 60
+
+
+def schedule_next_tick():
+    """Queue the next tick at the time the poller picks"""
+
+    run_date = poller.next_run()
+    # nothing else schedules the tick after this one, so a late start (a busy loop, a suspended
+    # host, a clock jump) must still run it rather than be dropped as missed
+    scheduler.add_job(adaptive_tick, "date", run_date=run_date, id="tick",
+                      replace_existing=True, misfire_grace_time=None, coalesce=True)
+    logger.info(f"Next check at {run_date:%Y-%m-%d %H:%M}")
+
+
+async def adaptive_tick():
+    try:
+        await itscheckintime()
+    finally:
+        # a failed tick still has to schedule the next one
+        schedule_next_tick()
+
+
+async def probe_listings():
+    """Cheap change probe between ticks, runs the next tick now if a listing changed"""
+
+    from apscheduler.jobstores.base import JobLookupError
+
+    csa = get_reporter()
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(executor, csa.probe_listings):
+        return
+    try:
+        scheduler.modify_job("tick", next_run_time=datetime.datetime.now(poller.tz))
+        logger.info("Listing changed, checking now")
+    except JobLookupError:
+        # a tick is already running
+        pass
+
+
+def publication_times(seen, section: str):
+    """When the articles of a section were first seen, leaving out the first pass
+
+    The first pass over a section migrates every card on its listing from the
+    record.json watermark at once, so its times only say when the bot was
+    deployed, not when anything was published.
+    """
+
+    times = sorted(seen_at for key, (seen_section, seen_at) in seen.entries.items()
+                   if seen_section == section and not key.startswith("sha1:"))
+    return [seen_at for seen_at in times if seen_at - times[0] > BOOTSTRAP_SECONDS]
+
+
+def start_adaptive(csa: csa_report):
+    """Replace the fixed cron with ticks timed by the adaptive poller"""
+
+    global poller
+    poller = adaptive_poller(
+        join(dirname(__file__), "output/schedule.json"),
+        csa.tup_type,
+        min_interval=csa.schedule["min_minutes"] * 60,
+        max_interval=csa.schedule["max_minutes"] * 60,
     )
+    # first run, learn from when the already seen articles turned up
+    for section in csa.tup_type:
+        poller.seed(section, publication_times(csa.seen, section))
+    scheduler.add_job(adaptive_tick, id="tick", misfire_grace_time=None)
+    scheduler.add_job(probe_listings, "interval",
+                      minutes=csa.schedule["probe_minutes"], id="probe")
+
+
+#################### ONE-SHOT RUN #########################
+
+# exit status of --once
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_PARTIAL = 2
+EXIT_UNDELIVERED = 3
+
+
+async def run_once():
+    """One check for system cron or a container job, returns the exit status"""
+
+    try:
+        succeeded, undelivered = await itscheckintime()
+    except Exception as e:
+        logger.exception(f"Check failed: {e}")
+        return EXIT_FAILED
+
+    csa = get_reporter()
+    if not succeeded:
+        return EXIT_FAILED
+    if undelivered:
+        logger.error(f"{undelivered} articles left in the outbox for the next run")
+        return EXIT_UNDELIVERED
+    if len(succeeded) < len(csa.sections):
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def serve():
+    """Long-running mode, ticks from the scheduler until interrupted"""
+
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from keep_alive import keep_alive
+
+    global scheduler
+    # the scheduler is started before the loop runs, so it is handed the loop explicitly
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    scheduler = AsyncIOScheduler(timezone="Asia/Singapore", event_loop=loop)
+
+    csa = get_reporter()
+
+    # liveness and /metrics for prometheus
+    if csa.keep_alive["port"]:
+        keep_alive(csa.keep_alive["host"], csa.keep_alive["port"])
+    if csa.schedule["mode"] == "adaptive":
+        start_adaptive(csa)
+    else:
+        scheduler.add_job(
+            itscheckintime, "cron", day_of_week="mon-fri", hour="8-18/1"
+        )
+    scheduler.add_job(resume_outbox, misfire_grace_time=None)
     scheduler.start()
     logger.info(
         "Press Ctrl+{0} to exit".format("Break" if os.name == "nt" else "C"))
 
     # Execution will block here until Ctrl+C (Ctrl+Break on Windows) is pressed.
     try:
-        asyncio.get_event_loop().run_forever()
+        loop.run_forever()
     except (KeyboardInterrupt, SystemExit) as e:
         logger.warning(e)
         raise e
+    finally:
+        scheduler.shutdown(wait=False)
+
+
+STARTUP_SECONDS.set(time.perf_counter() - STARTED, phase="import")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Post new CSA alerts, advisories and bulletins to a discord webhook",
+        epilog=f"--once exit status: {EXIT_OK} ok, {EXIT_FAILED} every section failed, "
+               f"{EXIT_PARTIAL} some sections failed, {EXIT_UNDELIVERED} articles left undelivered")
+    parser.add_argument("--once", action="store_true",
+                        help="run a single check and exit instead of scheduling checks")
+    args = parser.parse_args()
+
+    status = EXIT_OK
+    try:
+        if args.once:
+            status = asyncio.run(run_once())
+            logger.info(f"Exit status {status}")
+        else:
+            serve()
+    finally:
+        executor.shutdown(wait=False)
+        if pool is not None:
+            pool.close()
+        article_outbox.close()
+    sys.exit(status)
@@ -0,0 +1,91 @@
+import re
+
+# below this many keywords a plain substring scan beats the regex
+SMALL_LIST = 200
+
+
+def _trie_pattern(words: list):
+    # Build a regex from a trie of the words, so matching cost grows with
+    # keyword length rather than with the number of keywords
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            # a keyword ends here, longer keywords are still tried first
+            pattern = f"(?:{pattern})?"
+        return pattern
+
+    return build(trie), trie
+
+
+class keyword_matcher:
+    # Precompiled matcher for a case-sensitive and a case-insensitive keyword
+    # list. Case-insensitive keywords are matched against the casefolded text,
+    # which is folded once per call instead of once per keyword.
+
+    def __init__(self, keywords: list = None, keywords_i: list = None):
+
+        self.keywords = sorted({w for w in keywords or [] if w})
+        # casefolded keyword -> keyword as written in the config
+        self.keywords_i = {w.casefold(): w for w in keywords_i or [] if w}
+
+        self._exact = self._compile(self.keywords)
+        self._folded = self._compile(list(self.keywords_i))
+
+    def __len__(self):
+        return len(self.keywords) + len(self.keywords_i)
+
+    @staticmethod
+    def _compile(words: list):
+        if not words:
+            return None
+        pattern, trie = _trie_pattern(words)
+        return re.compile(pattern), re.compile(f"(?=({pattern}))"), trie
+
+    def search(self, text: str):
+        # True if any keyword occurs in text
+        if not text:
+            return False
+        if len(self) <= SMALL_LIST:
+            if any(w in text for w in self.keywords):
+                return True
+            folded = text.casefold()
+            return any(w in folded for w in self.keywords_i)
+        if self._exact and self._exact[0].search(text):
+            return True
+        return bool(self._folded and self._folded[0].search(text.casefold()))
+
+    @staticmethod
+    def _hits(compiled, text: str):
+        _, overlapping, trie = compiled
+        hits = set()
+        for longest in set(overlapping.findall(text)):
+            # every keyword that is a prefix of the longest one at this position
+            node = trie
+            for i, char in enumerate(longest):
+                node = node[char]
+                if "" in node:
+                    hits.add(longest[:i + 1])
+        return hits
+
+    def matches(self, text: str):
+        # Every keyword that occurs in text, as written in the config
+        if not text:
+            return []
+        hits = set()
+        if self._exact:
+            hits |= self._hits(self._exact, text)
+        if self._folded:
+            hits |= {self.keywords_i[w]
+                     for w in self._hits(self._folded, text.casefold())}
+        return sorted(hits)
@@ -0,0 +1,134 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Small in-process metrics registry rendered in the Prometheus text format
+# by the keep_alive server. Metrics are updated from the scheduler thread and
+# the section worker threads, so every update takes the metric's lock.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+REGISTRY = []
+
+
+def _labels(names: tuple, values: tuple, extra: str = ""):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(
+                    f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class gauge(counter):
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self.values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> ([count per bucket], sum, count)
+        self.values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self.values.get(
+                key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = _labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{le} {bucket_count}")
+                le = _labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(
+                    f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+                lines.append(
+                    f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render():
+    # Every registered metric in the Prometheus text exposition format
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+#################### PIPELINE METRICS #########################
+
+# stage is one of browser_launch, fetch, page_load, card_wait, parse, filter, match, cluster, bulletin, embed, webhook_send
+STAGE_SECONDS = histogram(
+    "csa_stage_seconds", "Time spent in each pipeline stage", ("stage", "section"))
+ARTICLES = counter(
+    "csa_articles_total", "Articles read from the listings, by outcome", ("section", "outcome"))
+FETCH_PATHS = counter(
+    "csa_fetch_path_total", "Listing fetches by extraction path", ("section", "path"))
+WEBHOOK_POSTS = counter(
+    "csa_webhook_posts_total", "Webhook posts by HTTP status", ("status",))
+LAST_SUCCESS = gauge(
+    "csa_last_success_timestamp_seconds", "Unix time of the last successful run", ("section",))
+SECTION_FAILURES = counter(
+    "csa_section_failures_total", "Failed section fetches by reason", ("section", "reason"))
+SECTION_SKIPPED = counter(
+    "csa_section_skipped_total", "Section fetches skipped by an open circuit", ("section",))
+CIRCUIT_OPEN = gauge(
+    "csa_circuit_open", "1 while the section's circuit is open", ("section",))
+STARTUP_SECONDS = gauge(
+    "csa_startup_seconds", "Seconds from importing main until each startup phase finished", ("phase",))
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import threading
+import time
+
+from article import article
+from subscribers import DEFAULT
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    section TEXT NOT NULL,
+    subscriber TEXT NOT NULL,
+    url TEXT NOT NULL,
+    article TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    sent_at REAL,
+    failed_at REAL,
+    error TEXT,
+    UNIQUE (section, subscriber, url)
+)"""
+
+
+class outbox:
+    # Durable queue of filtered articles waiting for delivery (SQLite in WAL mode).
+    # Articles are added as soon as they pass the filter and marked sent once
+    # Discord accepted them, so a restart only resends what never went out.
+    # Every subscriber has its own row per article, delivered independently.
+    # Articles Discord refuses outright are set aside as failed (dead letters)
+    # instead of holding up the queue.
+
+    def __init__(self, path: str):
+
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(outbox)")]
+        if columns and "subscriber" not in columns:
+            # outbox from before subscribers, its rows belong to the default channel
+            with self.conn:
+                self.conn.execute("ALTER TABLE outbox RENAME TO outbox_single")
+                self.conn.execute(SCHEMA)
+                self.conn.execute(
+                    "INSERT INTO outbox (id, section, subscriber, url, article, queued_at, sent_at) "
+                    "SELECT id, section, ?, url, article, queued_at, sent_at FROM outbox_single", (DEFAULT,))
+                self.conn.execute("DROP TABLE outbox_single")
+        elif columns and "failed_at" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE outbox ADD COLUMN failed_at REAL")
+                self.conn.execute("ALTER TABLE outbox ADD COLUMN error TEXT")
+        self.conn.execute(SCHEMA)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_unsent ON outbox (sent_at, id)")
+        self.conn.commit()
+
+    def add(self, section: str, articles: list, subscriber: str = DEFAULT):
+        # Queue articles for a subscriber, articles already in its queue are ignored.
+        # Revisions carry an outbox_key so they are queued next to the original.
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO outbox (section, subscriber, url, article, queued_at) VALUES (?, ?, ?, ?, ?)",
+                [(section, subscriber, obj.get("outbox_key") or obj["csa"], json.dumps(dict(obj)), now)
+                 for obj in articles],
+            )
+
+    def pending(self):
+        # Unsent articles in the order they were queued, as (id, section, subscriber, article, queued_at)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, section, subscriber, article, queued_at FROM outbox "
+                "WHERE sent_at IS NULL AND failed_at IS NULL ORDER BY id"
+            ).fetchall()
+        return [(row_id, section, subscriber, article.from_dict(json.loads(record), section), queued_at)
+                for row_id, section, subscriber, record, queued_at in rows]
+
+    def mark_sent(self, ids: list):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET sent_at = ? WHERE id = ?", [(now, row_id) for row_id in ids]
+            )
+
+    def mark_failed(self, ids: list, error: str):
+        # Set articles aside for good, they are kept for inspection but never sent again
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET failed_at = ?, error = ? WHERE id = ?", [(now, error, row_id) for row_id in ids]
+            )
+
+    def purge(self, days: int = 30):
+        # Drop delivered and failed articles older than the given number of days
+        cutoff = time.time() - days * 86400
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM outbox WHERE sent_at < ? OR failed_at < ?", (cutoff, cutoff),
+            )
+
+    def close(self):
+        self.conn.close()
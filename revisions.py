@@ -0,0 +1,130 @@
+import difflib
+import hashlib
+import json
+import logging
+import os
+import time
+
+# card fields read off the listing on every tick, and detail fields from enrichment
+CARD_FIELDS = ("title", "description", "created")
+DETAIL_FIELDS = ("severity", "cves", "products")
+
+MAX_FIELD = 1024
+
+
+def fingerprint(article, fields: tuple = CARD_FIELDS):
+    # Short hash over the given fields, compared once per card per tick
+    content = "\x1f".join(json.dumps(article.get(field), sort_keys=True) for field in fields)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class fingerprint_store:
+    # Content fingerprints of recently published articles, keyed by URL, with
+    # the field values they were taken from so a revision can be diffed.
+    # Articles first seen more than window_days ago are no longer tracked;
+    # changes are kept in memory until commit().
+
+    def __init__(self, path: str, window_days: float = 30, max_entries: int = 5000):
+
+        self.path = path
+        self.window_days = window_days
+        self.max_entries = max_entries
+        self.logger = logging.getLogger("__main__")
+
+        # url -> {"fp", "fields", "ts"}, oldest first
+        self.entries = {}
+        self.dirty = False
+
+        try:
+            with open(self.path, "r") as json_file:
+                self.entries = json.load(json_file)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"fingerprints unreadable, starting empty: {e}")
+
+    def __contains__(self, url: str):
+        return url in self.entries
+
+    def record(self, article):
+        # Track an article, keeping when it was first seen and its place in the oldest first order
+        previous = self.entries.get(article["csa"])
+        # detail fields are kept from earlier records when this article has none
+        fields = dict(previous["fields"]) if previous else {}
+        fields.update({field: article.get(field) for field in CARD_FIELDS + DETAIL_FIELDS
+                       if article.get(field) is not None})
+        self.entries[article["csa"]] = {
+            "fp": fingerprint(article),
+            "fields": fields,
+            "ts": previous["ts"] if previous else time.time(),
+        }
+        self.dirty = True
+
+    def revised(self, article):
+        # {field: [old, new]} of the card fields that changed, None if the card is unchanged or untracked
+        entry = self.entries.get(article["csa"])
+        if entry is None or entry["fp"] == fingerprint(article):
+            return None
+        return {field: [entry["fields"].get(field), article.get(field)]
+                for field in CARD_FIELDS if entry["fields"].get(field) != article.get(field)} or None
+
+    def detail_changes(self, article):
+        # {field: [old, new]} of the enrichment fields that changed since the article was recorded
+        entry = self.entries.get(article["csa"])
+        if entry is None:
+            return {}
+        return {field: [entry["fields"].get(field), article.get(field)]
+                for field in DETAIL_FIELDS
+                if article.get(field) is not None and entry["fields"].get(field) != article.get(field)}
+
+    def prune(self):
+        cutoff = time.time() - self.window_days * 86400
+        expired = [url for url, entry in self.entries.items() if entry["ts"] < cutoff]
+        expired += list(self.entries)[len(expired):len(self.entries) - self.max_entries]
+        for url in expired:
+            del self.entries[url]
+            self.dirty = True
+
+    def commit(self):
+        if not self.dirty:
+            return
+        self.prune()
+        self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(self.entries, json_file)
+        os.replace(tmp_path, self.path)
+
+
+def diff_text(old: str, new: str):
+    # Word level diff, removed words struck through and added words in bold
+    old_words, new_words = (old or "").split(), (new or "").split()
+    parts = []
+    for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_words, new_words).get_opcodes():
+        if op == "equal":
+            words = old_words[i1:i2]
+            # long unchanged runs are shortened to their ends
+            parts.append(" ".join(words) if len(words) <= 8
+                         else f"{' '.join(words[:3])} ... {' '.join(words[-3:])}")
+            continue
+        if i2 > i1:
+            parts.append(f"~~{' '.join(old_words[i1:i2])}~~")
+        if j2 > j1:
+            parts.append(f"**{' '.join(new_words[j1:j2])}**")
+    return " ".join(parts)
+
+
+def diff_list(old: list, new: list):
+    old, new = old or [], new or []
+    lines = [f"+ {item}" for item in new if item not in old]
+    lines += [f"- {item}" for item in old if item not in new]
+    return "\n".join(lines)
+
+
+def render_change(old, new):
+    # Field value for an "updated" embed
+    if isinstance(old, list) or isinstance(new, list):
+        text = diff_list(old, new)
+    else:
+        text = diff_text(old, new)
+    return text[:MAX_FIELD - 3] + "..." if len(text) > MAX_FIELD else text or "(cleared)"
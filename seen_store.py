@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+def article_keys(article: dict):
+    # URL plus a hash of the normalised content, either one marks the article as seen
+    content = " ".join(
+        f"{article.get('title', '')} {article.get('description', '')}".lower().split())
+    return (article["csa"], "sha1:" + hashlib.sha1(content.encode("utf-8")).hexdigest())
+
+
+class seen_store:
+    # Persistent index of every article already handled, with O(1) lookups.
+    # Additions are staged until commit() appends them to a log file, or
+    # discard() drops them when the tick that made them failed; once the log holds
+    # twice as many lines as live entries, or the index grows past
+    # max_entries, it is compacted down to the newest max_entries keys.
+
+    def __init__(self, path: str, max_entries: int = 20000):
+
+        self.path = path
+        self.max_entries = max_entries
+        self.logger = logging.getLogger("__main__")
+
+        # key -> (section, first seen), oldest first
+        self.entries = {}
+        self.sections = {}
+        # key -> (section, first seen), staged until commit()
+        self.pending = {}
+        self.lines = 0
+        self._lock = threading.Lock()
+
+        try:
+            with open(self.path, "r") as seen_file:
+                for line in seen_file:
+                    self.lines += 1
+                    try:
+                        key, section, seen_at = json.loads(line)
+                    except ValueError:
+                        # torn write from a crash, everything before it is still good
+                        continue
+                    self._index(key, section, seen_at)
+        except FileNotFoundError:
+            pass
+
+    def _index(self, key: str, section: str, seen_at: float):
+        if key not in self.entries:
+            self.sections[section] = self.sections.get(section, 0) + 1
+        self.entries[key] = (section, seen_at)
+
+    def __contains__(self, key: str):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def has_section(self, section: str):
+        return self.sections.get(section, 0) > 0
+
+    def seen(self, article: dict):
+        return any(key in self.entries or key in self.pending for key in article_keys(article))
+
+    def add(self, section: str, article: dict):
+        now = time.time()
+        with self._lock:
+            for key in article_keys(article):
+                if key not in self.entries and key not in self.pending:
+                    self.pending[key] = (section, now)
+
+    def discard(self):
+        # Drop everything added since the last commit, those articles count as new again
+        with self._lock:
+            self.pending = {}
+
+    def commit(self):
+        # Index and append everything added since the last commit, compacting when due
+        with self._lock:
+            if self.pending:
+                with open(self.path, "a") as seen_file:
+                    seen_file.writelines(json.dumps([key, section, seen_at]) + "\n"
+                                         for key, (section, seen_at) in self.pending.items())
+                    seen_file.flush()
+                    os.fsync(seen_file.fileno())
+                for key, (section, seen_at) in self.pending.items():
+                    self._index(key, section, seen_at)
+                self.lines += len(self.pending)
+                self.pending = {}
+
+            if len(self.entries) > self.max_entries or self.lines > 2 * max(len(self.entries), 1000):
+                self._compact()
+
+    def _compact(self):
+        keep = list(self.entries.items())[-self.max_entries:]
+        self.entries = {}
+        self.sections = {}
+        for key, (section, seen_at) in keep:
+            self._index(key, section, seen_at)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as seen_file:
+            seen_file.writelines(json.dumps([key, section, seen_at]) + "\n"
+                                 for key, (section, seen_at) in keep)
+            seen_file.flush()
+            os.fsync(seen_file.fileno())
+        os.replace(tmp_path, self.path)
+        self.lines = len(keep)
+        self.logger.info(f"Seen store compacted to {self.lines} keys")
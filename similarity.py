@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+import zlib
+
+from enrich import CVE_PATTERN
+from subscribers import DEFAULT
+
+# 2^61 - 1, the permutations are a * x + b mod PRIME over 32 bit shingle hashes
+PRIME = (1 << 61) - 1
+STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with",
+             "vulnerability", "vulnerabilities", "security", "update", "updates"}
+WORD = re.compile(r"[a-z0-9]+(?:[.-][a-z0-9]+)*")
+
+
+def shingles(text: str):
+    # Word bigrams of the lower-cased text, without filler words
+    words = [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def article_cves(article: dict):
+    text = f"{article.get('title', '')} {article.get('description', '')}"
+    return sorted({cve.upper() for cve in CVE_PATTERN.findall(text)} | set(article.get("cves") or []))
+
+
+class similarity_index:
+    # MinHash/LSH index of recently notified articles across every section.
+    # Two articles are near-duplicates when they share a CVE ID or when the
+    # estimated Jaccard similarity of their title and description bigrams is
+    # at least threshold. LSH bands keep a lookup proportional to the number
+    # of candidates instead of the size of the history. Articles are only
+    # merged for subscribers that get both, see cluster(). Entries older than
+    # window_days are dropped; new entries are kept in memory until commit().
+
+    def __init__(self, path: str, num_perm: int = 64, bands: int = 16, threshold: float = 0.6,
+                 window_days: float = 14, max_entries: int = 5000):
+
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window_days = window_days
+        self.max_entries = max_entries
+        self.logger = logging.getLogger("__main__")
+
+        rng = random.Random(num_perm)
+        self.perms = [(rng.randrange(1, PRIME), rng.randrange(PRIME))
+                      for _ in range(num_perm)]
+
+        # url -> {"section", "title", "cluster", "sig", "cves", "routes", "ts"}, oldest first
+        self.entries = {}
+        self.buckets = {}
+        self.cve_index = {}
+        self.dirty = False
+
+        try:
+            with open(self.path, "r") as json_file:
+                saved = json.load(json_file)
+            for url, entry in saved.items():
+                if len(entry["sig"]) == num_perm:
+                    self._index(url, entry)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"similarity index unreadable, starting empty: {e}")
+
+    def signature(self, article: dict):
+        hashes = [zlib.crc32(s.encode("utf-8"))
+                  for s in shingles(f"{article.get('title', '')} {article.get('description', '')}")]
+        if not hashes:
+            return [PRIME] * self.num_perm
+        return [min((a * h + b) % PRIME for h in hashes) for a, b in self.perms]
+
+    def _band_keys(self, sig: list):
+        return [(i, tuple(sig[i * self.rows:(i + 1) * self.rows])) for i in range(self.bands)]
+
+    def _index(self, url: str, entry: dict):
+        if url in self.entries:
+            self._unindex(url)
+        self.entries[url] = entry
+        for key in self._band_keys(entry["sig"]):
+            self.buckets.setdefault(key, set()).add(url)
+        for cve in entry["cves"]:
+            self.cve_index.setdefault(cve, set()).add(url)
+
+    def _unindex(self, url: str):
+        entry = self.entries.pop(url)
+        for key in self._band_keys(entry["sig"]):
+            self.buckets[key].discard(url)
+            if not self.buckets[key]:
+                del self.buckets[key]
+        for cve in entry["cves"]:
+            self.cve_index[cve].discard(url)
+            if not self.cve_index[cve]:
+                del self.cve_index[cve]
+
+    def find(self, url: str, sig: list, cves: list):
+        # Closest indexed article to this one, or None
+        for cve in cves:
+            hits = self.cve_index.get(cve, set()) - {url}
+            if hits:
+                return min(hits, key=lambda hit: self.entries[hit]["ts"])
+
+        candidates = set()
+        for key in self._band_keys(sig):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(url)
+
+        best, best_score = None, self.threshold
+        for hit in candidates:
+            other = self.entries[hit]["sig"]
+            score = sum(x == y for x, y in zip(sig, other)) / self.num_perm
+            if score >= best_score:
+                best, best_score = hit, score
+        return best
+
+    def cluster(self, new_articles: dict):
+        # Group this tick's articles ({section: [articles]}, most urgent section first)
+        # with each other and with recent history. The first article of a cluster is
+        # kept and gets a "related" list of the others; articles joining a cluster
+        # notified on an earlier tick are dropped unless they bring new CVE IDs.
+        # An article is only merged or dropped when every subscriber it is routed
+        # to gets the other one too, otherwise it is kept for its own subscribers.
+        # Returns ({section: [kept]}, dropped).
+        self.prune()
+        kept = {section: [] for section in new_articles}
+        primaries = {}
+        dropped = 0
+        now = time.time()
+
+        for section, articles in new_articles.items():
+            for article in articles:
+                url = article["csa"]
+                sig = self.signature(article)
+                cves = article_cves(article)
+                routes = set(article.get("routes") or ())
+                hit = self.find(url, sig, cves)
+                root = self.entries[hit]["cluster"] if hit else url
+                if root != url and root not in primaries and set(cves) - set(self.entries[hit]["cves"]):
+                    # an earlier notification does not cover every CVE of this one
+                    root = url
+                if root != url:
+                    # entries from before subscribers only went to the default channel
+                    covered = (primaries[root].get("routes") or ()) if root in primaries \
+                        else self.entries[hit].get("routes", [DEFAULT])
+                    if not routes <= set(covered):
+                        # some subscriber of this article would never hear of it
+                        root = url
+
+                if root == url:
+                    kept[section].append(article)
+                    primaries[url] = article
+                elif root in primaries:
+                    primaries[root].setdefault("related", []).append(
+                        {"section": section, "title": article["title"], "csa": url})
+                else:
+                    dropped += 1
+                    self.logger.info(
+                        f"{section}: {article['title']} duplicates {self.entries[hit]['title']}")
+
+                self._index(url, {"section": section, "title": article["title"], "cluster": root,
+                                  "sig": sig, "cves": cves, "routes": sorted(routes), "ts": now})
+                self.dirty = True
+
+        return kept, dropped
+
+    def prune(self):
+        cutoff = time.time() - self.window_days * 86400
+        expired = [url for url, entry in self.entries.items() if entry["ts"] < cutoff]
+        expired += list(self.entries)[len(expired):len(self.entries) - self.max_entries]
+        for url in expired:
+            self._unindex(url)
+            self.dirty = True
+
+    def commit(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(self.entries, json_file)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,80 @@
+import json
+import logging
+import os
+
+
+class state_journal:
+    # Key/value state kept as a snapshot plus an append-only journal of changes.
+    # update() appends only the keys that changed and fsyncs the line, so a
+    # crash can at worst lose the line being written. Every compact_every
+    # updates the state is written to a new snapshot that atomically replaces
+    # the old one, and the journal is emptied. Replaying a journal over a newer
+    # snapshot is harmless, since every line holds full values.
+
+    def __init__(self, snapshot_path: str, journal_path: str, compact_every: int = 50):
+
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.logger = logging.getLogger("__main__")
+
+        self.state = {}
+        self.journaled = 0
+        torn = False
+
+        try:
+            with open(self.snapshot_path, "r") as json_file:
+                self.state = json.load(json_file)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            # a snapshot truncated by the old in-place rewrite, the journal may still have the state
+            self.logger.error(f"State snapshot unreadable: {e}")
+
+        try:
+            with open(self.journal_path, "r") as journal_file:
+                for line in journal_file:
+                    try:
+                        self.state.update(json.loads(line))
+                    except ValueError:
+                        # torn last write, everything before it is consistent
+                        torn = True
+                        break
+                    self.journaled += 1
+        except FileNotFoundError:
+            pass
+
+        # start a clean journal so new lines are not appended to the torn one
+        if torn:
+            self.compact()
+
+    def get(self, key: str, default=None):
+        return self.state.get(key, default)
+
+    def update(self, values: dict):
+        # Journal the keys whose value changed
+        changes = {key: value for key, value in values.items()
+                   if self.state.get(key) != value}
+        if not changes:
+            return
+        with open(self.journal_path, "a") as journal_file:
+            journal_file.write(json.dumps(changes) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        self.state.update(changes)
+        self.journaled += 1
+
+        if self.journaled >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        # Write a fresh snapshot and start an empty journal
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as json_file:
+            json.dump(self.state, json_file)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        with open(self.journal_path, "w") as journal_file:
+            os.fsync(journal_file.fileno())
+        self.journaled = 0
@@ -0,0 +1,140 @@
+import os
+
+from matcher import keyword_matcher
+
+# the top-level ALL_VALID and keyword lists of config.yaml, posting to DISCORD_WEBHOOK_URL
+DEFAULT = "default"
+
+
+class subscriber:
+    # One channel: the sections it follows, its keyword filter and the
+    # environment variable holding its webhook URL.
+
+    def __init__(self, name: str, webhook_env: str, sections: tuple, all_valid: bool = False,
+                 keywords: list = None, keywords_i: list = None, product: list = None, product_i: list = None):
+
+        self.name = name
+        self.webhook_env = webhook_env
+        self.sections = tuple(sections)
+        self.all_valid = all_valid
+        self.keywords = [w for w in keywords or [] if w]
+        self.keywords_i = [w for w in keywords_i or [] if w]
+        self.product = [w for w in product or [] if w]
+        self.product_i = [w for w in product_i or [] if w]
+        # for the bulletin entries this channel gets
+        self.product_matcher = keyword_matcher(self.product, self.product_i)
+
+    @property
+    def webhook(self):
+        return os.getenv(self.webhook_env)
+
+
+def subscriber_from_config(entry: dict, sections: tuple):
+    # A SUBSCRIBERS entry of config.yaml, raises ValueError if it is incomplete
+    name = entry.get("NAME")
+    if not name or not entry.get("WEBHOOK_ENV"):
+        raise ValueError(f"subscriber needs NAME and WEBHOOK_ENV: {entry}")
+    wanted = entry.get("SECTIONS") or sections
+    unknown = set(wanted) - set(sections)
+    if unknown:
+        raise ValueError(f"subscriber {name}: unknown SECTIONS {sorted(unknown)}")
+    return subscriber(
+        name, entry["WEBHOOK_ENV"], wanted,
+        all_valid=bool(entry.get("ALL_VALID")),
+        keywords=entry.get("DESCRIPTION_KEYWORDS"),
+        keywords_i=entry.get("DESCRIPTION_KEYWORDS_I"),
+        product=entry.get("PRODUCT_KEYWORDS"),
+        product_i=entry.get("PRODUCT_KEYWORDS_I"),
+    )
+
+
+class keyword_field:
+    # Inverted index of one keyword field over every subscriber: one matcher
+    # for the case-sensitive keywords and one for the case-insensitive ones,
+    # and the subscribers behind each keyword.
+
+    def __init__(self, lists: list):
+
+        # keyword -> subscriber positions
+        self.exact_index = {}
+        # casefolded keyword -> {subscriber position: keyword as that subscriber wrote it}
+        self.folded_index = {}
+        for position, (keywords, keywords_i) in enumerate(lists):
+            for word in keywords:
+                self.exact_index.setdefault(word, set()).add(position)
+            for word in keywords_i:
+                self.folded_index.setdefault(word.casefold(), {})[position] = word
+
+        self.exact = keyword_matcher(list(self.exact_index), None)
+        self.folded = keyword_matcher(None, list(self.folded_index))
+
+    def hits(self, text: str, found: dict):
+        # Add {subscriber position: {keywords}} for every keyword in text
+        for word in self.exact.matches(text):
+            for position in self.exact_index[word]:
+                found.setdefault(position, set()).add(word)
+        for folded in self.folded.matches(text):
+            for position, word in self.folded_index[folded].items():
+                found.setdefault(position, set()).add(word)
+
+
+class subscriber_index:
+    # Routes every article to the subscribers that want it. Each article is
+    # scanned once per keyword field whatever the number of subscribers, and
+    # the hits are mapped back to subscribers through the inverted index.
+
+    def __init__(self, subscribers: list):
+
+        names = [s.name for s in subscribers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate subscriber names in {names}")
+
+        self.subscribers = subscribers
+        self.by_name = {s.name: s for s in subscribers}
+        self.description = keyword_field(
+            [(s.keywords, s.keywords_i) for s in subscribers])
+        self.product = keyword_field(
+            [(s.product, s.product_i) for s in subscribers])
+
+        # section -> subscriber positions following it, and those taking everything
+        self.followers = {}
+        self.all_valid = {}
+        for position, s in enumerate(subscribers):
+            for section in s.sections:
+                self.followers.setdefault(section, set()).add(position)
+                if s.all_valid:
+                    self.all_valid.setdefault(section, set()).add(position)
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def route(self, obj, section: str):
+        # {subscriber name: matched keywords} for every subscriber that wants the article
+        found = {}
+        self.description.hits(obj["description"], found)
+        self.product.hits(f"{obj['title']}\n{obj['description']}", found)
+
+        followers = self.followers.get(section, set())
+        routes = {self.subscribers[position].name: sorted(words)
+                  for position, words in found.items() if position in followers}
+        for position in self.all_valid.get(section, ()):
+            routes.setdefault(self.subscribers[position].name, [])
+        return routes
+
+    def fan_out(self, articles: list):
+        # {subscriber name: [article records]}, each carrying that subscriber's keywords
+        # and its own "route_fields" (the bulletin entries it gets, say)
+        queued = {}
+        for obj in articles:
+            for name, words in (obj.get("routes") or {}).items():
+                record = dict(obj)
+                del record["routes"]
+                record.update(record.pop("route_fields", {}).get(name, {}))
+                if words:
+                    record["keywords"] = words
+                queued.setdefault(name, []).append(record)
+        return queued
+
+    def webhooks(self):
+        # subscriber name -> webhook URL, subscribers without one are left out
+        return {s.name: s.webhook for s in self.subscribers if s.webhook}
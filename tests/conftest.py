@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# the modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# listing pages and endpoint responses saved from the CSA site
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture_text(name: str):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as fixture_file:
+        return fixture_file.read()
+
+
+class listing_server:
+    # Local stand-in for the CSA site: serves pages by path with an ETag and
+    # answers 304 when the client sends the ETag back
+
+    def __init__(self):
+
+        self.pages = {}
+        self.requests = []
+        server = self
+
+        class handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                server.requests.append((path, self.headers.get("If-None-Match")))
+                if path not in server.pages:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body, etag = server.pages[path]
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body.encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def serve(self, path: str, body: str, etag: str = None):
+        self.pages[path] = (body, etag)
+
+    def validators_sent(self, path: str):
+        # If-None-Match sent with every request for path
+        return [etag for requested, etag in self.requests if requested == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub_site():
+    server = listing_server()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def reporter(tmp_path, stub_site):
+    # A reporter reading listings from the stub site, with all of its state in tmp_path
+    from csa import csa_report
+    from http_cache import http_cache
+    from revisions import fingerprint_store
+    from seen_store import seen_store
+    from similarity import similarity_index
+    from state_journal import state_journal
+
+    csa = csa_report()
+    csa.CSA_URL = stub_site.url
+    csa.http_cache = http_cache(str(tmp_path / "http_cache.json"))
+    csa.seen = seen_store(str(tmp_path / "seen.log"))
+    csa.similarity = similarity_index(str(tmp_path / "similarity.json"))
+    csa.fingerprints = fingerprint_store(str(tmp_path / "fingerprints.json"))
+    csa.state = state_journal(str(tmp_path / "record.json"), str(tmp_path / "record.journal"))
+    return csa
@@ -0,0 +1,124 @@
+import datetime
+import json
+import random
+
+from adaptive import adaptive_poller
+
+TZ = "Asia/Singapore"
+MINUTE = 60
+
+
+class sim_clock:
+    # Simulated wall clock for the poller, moved forward by hand
+
+    def __init__(self, start: datetime.datetime):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += datetime.timedelta(seconds=seconds)
+
+
+def poller(tmp_path, clock, jitter=0.0):
+    return adaptive_poller(str(tmp_path / "schedule.json"), ("ALERTS",), min_interval=15 * MINUTE,
+                           max_interval=4 * 3600, jitter=jitter, timezone=TZ, clock=clock,
+                           rng=random.Random(1))
+
+
+def at(clock_poller, day: int, hour: int, minute: int = 0):
+    # A time counted in days from Monday 4 March 2024
+    return datetime.datetime(2024, 3, 4, hour, minute, tzinfo=clock_poller.tz) + datetime.timedelta(days=day)
+
+
+def publications(clock_poller, weeks: int):
+    # Articles published on Tuesdays and Thursdays around 10am
+    return [at(clock_poller, day + 7 * week, 10, 5)
+            for week in range(-weeks, 2) for day in (1, 3)]
+
+
+def test_busy_slots_poll_fast_and_quiet_slots_slow(tmp_path):
+    clock = sim_clock(None)
+    p = poller(tmp_path, clock)
+    p.seed("ALERTS", [when.timestamp() for when in publications(p, 4) if when < at(p, 0, 0)])
+
+    # the hour before the Tuesday slot counts as busy too
+    assert p.next_delay(at(p, 1, 9, 30)) < 30 * MINUTE
+    assert p.next_delay(at(p, 6, 3)) > 3 * 3600
+
+
+def test_idle_polls_back_off_only_in_quiet_slots(tmp_path):
+    clock = sim_clock(None)
+    p = poller(tmp_path, clock)
+    p.seed("ALERTS", [when.timestamp() for when in publications(p, 4) if when < at(p, 0, 0)])
+    quiet, busy = at(p, 5, 14), at(p, 1, 10)
+    before = p.next_delay(quiet), p.next_delay(busy)
+
+    for _ in range(5):
+        p.record("ALERTS", 0, quiet)
+
+    assert p.next_delay(quiet) > before[0]
+    assert p.next_delay(quiet) <= p.max_interval
+    assert p.next_delay(busy) < before[1] * 1.1
+
+
+def test_simulated_week_finds_articles_quickly_with_few_polls(tmp_path):
+    clock = sim_clock(None)
+    p = poller(tmp_path, clock, jitter=0.1)
+    published = publications(p, 4)
+    p.seed("ALERTS", [when.timestamp() for when in published if when < at(p, 0, 0)])
+    upcoming = [when for when in published if at(p, 0, 0) <= when < at(p, 7, 0)]
+
+    clock.now = at(p, 0, 0)
+    polls = 0
+    last_poll = clock()
+    latencies = []
+    while clock() < at(p, 7, 0):
+        found = [when for when in upcoming if last_poll < when <= clock()]
+        latencies += [(clock() - when).total_seconds() for when in found]
+        p.record("ALERTS", len(found))
+        polls += 1
+        last_poll = clock()
+        clock.advance(p.next_delay())
+
+    assert len(latencies) == len(upcoming) == 2
+    # a fixed 15 minute poll would take 672 polls for the same week
+    assert polls < 200
+    assert max(latencies) <= 15 * MINUTE * 1.1
+
+
+def test_history_survives_a_restart(tmp_path):
+    clock = sim_clock(None)
+    p = poller(tmp_path, clock)
+    p.record("ALERTS", 3, at(p, 1, 10))
+    p.record("ALERTS", 0, at(p, 1, 11))
+    p.save()
+
+    restored = poller(tmp_path, clock)
+
+    assert restored.history == p.history
+    assert restored.idle == {"ALERTS": 1}
+    # a seeded history is not overwritten
+    restored.seed("ALERTS", [at(p, 5, 3).timestamp()])
+    assert restored.history == p.history
+
+
+def test_bootstrap_pass_does_not_seed_the_deploy_hour(tmp_path):
+    from main import publication_times
+    from seen_store import seen_store
+
+    clock = sim_clock(None)
+    p = poller(tmp_path, clock)
+    # deployed on a Saturday at 3am, the first pass migrated 20 old cards at once
+    deployed = at(p, -23, 3).timestamp()
+    lines = [["https://csa/old-%d" % i, "ALERTS", deployed + i * 0.01] for i in range(20)]
+    lines += [["https://csa/new-%d" % i, "ALERTS", when.timestamp()]
+              for i, when in enumerate(publications(p, 3)) if when < at(p, 0, 0)]
+    with open(tmp_path / "seen.log", "w") as seen_file:
+        seen_file.writelines(json.dumps(line) + "\n" for line in lines)
+
+    p.seed("ALERTS", publication_times(seen_store(str(tmp_path / "seen.log")), "ALERTS"))
+
+    assert p.next_delay(at(p, 1, 9, 30)) < 30 * MINUTE
+    assert p.next_delay(at(p, 5, 3)) > 3 * 3600
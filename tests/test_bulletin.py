@@ -0,0 +1,69 @@
+import asyncio
+
+from article import article
+from bulletin import MAX_EMBED_CHARS, entries_description
+from subscribers import subscriber, subscriber_index
+
+
+def bulletin_with_everything(entries: int):
+    obj = article("https://example/bulletin", "Security Bulletin " + "x" * 200,
+                  "Weekly bulletin", "05 Mar 2024", "BULLETINS")
+    obj["entries"] = [{"cve": f"CVE-2024-{1000 + n}", "cvss": 9.8, "vendor": "Vendor " * 5,
+                       "product": "Product " * 5, "summary": "s" * 120} for n in range(entries)]
+    obj["entries_matched"] = entries + 40
+    obj["entries_total"] = entries + 400
+    obj["cves"] = [f"CVE-2024-{1000 + n}" for n in range(400)]
+    obj["products"] = ["Product name " * 8] * 20
+    obj["keywords"] = ["keyword " * 4] * 60
+    obj["severity"] = "Critical"
+    obj["related"] = [{"section": "ALERTS", "title": "t" * 100, "csa": "https://example/alert"}] * 10
+    return obj
+
+
+def test_bulletin_embed_fits_discord_limit(reporter):
+    embed = reporter.generate_new_bulletin_message(bulletin_with_everything(25))
+
+    assert len(embed) <= MAX_EMBED_CHARS
+    assert embed.description.endswith("more")
+    assert "CVEs" not in " ".join(field.name for field in embed.fields)
+
+
+def test_entries_description_stays_within_max_chars():
+    obj = bulletin_with_everything(25)
+
+    for max_chars in (300, 1000, 4000):
+        description = entries_description(obj, max_chars)
+        assert len(description) <= max_chars
+        assert description.endswith(f"... and {obj['entries_matched'] - description.count('CVE-')} more")
+
+
+TABLE = """<html><body><table>
+<tr><th>CVE Number</th><th>Vendor</th><th>Product</th><th>CVSS Score</th></tr>
+<tr><td>CVE-2024-20001</td><td>Cisco</td><td>IOS XE</td><td>9.8</td></tr>
+<tr><td>CVE-2024-20002</td><td>Fortinet</td><td>FortiOS</td><td>8.1</td></tr>
+<tr><td>CVE-2024-20003</td><td>Cisco</td><td>Webex</td><td>5.3</td></tr>
+</table></body></html>"""
+
+
+def test_bulletin_entries_are_chosen_per_subscriber(reporter, stub_site):
+    sections = reporter.tup_type
+    reporter.subscribers = subscriber_index([
+        subscriber("everything", "X_WEBHOOK", sections, all_valid=True),
+        subscriber("cisco", "Y_WEBHOOK", sections, product_i=["cisco"]),
+        subscriber("oracle", "Z_WEBHOOK", sections, product_i=["oracle"]),
+    ])
+    reporter.bulletin_entries = True
+    reporter.bulletin_min_cvss = 7.0
+    stub_site.serve("/bulletin", TABLE)
+    bulletin = article(f"{stub_site.url}/bulletin", "Security Bulletin 13 Mar 2024", "", "13 Mar 2024", "BULLETINS")
+    bulletin["routes"] = {"everything": [], "cisco": [], "oracle": []}
+    reporter.new_bullet = [bulletin]
+
+    asyncio.run(reporter.expand_new_bulletins())
+    records = reporter.subscribers.fan_out(reporter.new_bullet)
+
+    assert sorted(records) == ["cisco", "everything"]
+    assert [entry["cve"] for entry in records["everything"][0]["entries"]] == ["CVE-2024-20001", "CVE-2024-20002"]
+    assert [entry["cve"] for entry in records["cisco"][0]["entries"]] == ["CVE-2024-20001"]
+    assert records["cisco"][0]["entries_matched"] == 1
+    assert "route_fields" not in records["cisco"][0]
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from discord import Embed
+
+from delivery import delivery_queue
+
+
+class fake_response:
+    def __init__(self, status: int, body: str = "", headers: dict = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def json(self, content_type=None):
+        return json.loads(self.body)
+
+    async def read(self):
+        return self.body.encode("utf-8")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class fake_session:
+    # Answers posts with the queued responses, then 204s, and records the embed titles posted
+
+    def __init__(self, responses: list):
+        self.responses = responses
+        self.posted = []
+
+    def post(self, url: str, json: dict):
+        self.posted.append([embed["title"] for embed in json["embeds"]])
+        return self.responses.pop(0) if self.responses else fake_response(204)
+
+
+def deliver(session: fake_session, batches: list, rejected: list = None):
+    async def run():
+        queue = delivery_queue("https://discord.test/webhook", session, base_delay=0.01)
+        queue.start()
+        delivered = []
+        for titles in batches:
+            queue.submit(
+                [Embed(title=title) for title in titles],
+                on_delivered=lambda positions, titles=titles: delivered.append([titles[p] for p in positions]),
+                on_rejected=lambda positions, status, titles=titles: rejected.append(
+                    ([titles[p] for p in positions], status)) if rejected is not None else None)
+        await queue.join()
+        await queue.close()
+        return queue, delivered
+
+    return asyncio.run(run())
+
+
+def test_posts_stay_in_order_across_a_retry():
+    session = fake_session([fake_response(429, '{"retry_after": 0.05}')])
+
+    queue, delivered = deliver(session, [["a"], ["b"], ["c"]])
+
+    assert session.posted == [["a"], ["a"], ["b"], ["c"]]
+    assert delivered == [["a"], ["b"], ["c"]]
+    assert queue.stats()["rate_limited"] == 1
+
+
+def test_html_429_falls_back_to_retry_after():
+    session = fake_session([fake_response(429, "<html>Cloudflare</html>", {"Retry-After": "0.05"}),
+                            fake_response(429, "[]")])
+
+    queue, delivered = deliver(session, [["a"]])
+
+    assert delivered == [["a"]]
+    assert queue.stats()["failed"] == 0
+    assert queue.stats()["retries"] == 2
+
+
+def test_rejected_batch_is_posted_one_embed_at_a_time():
+    session = fake_session([fake_response(400, '{"embeds": ["0"]}'), fake_response(204),
+                            fake_response(400, '{"embeds": ["0"]}'), fake_response(204)])
+    rejected = []
+
+    queue, delivered = deliver(session, [["a", "too long", "c"], ["d"]], rejected)
+
+    assert session.posted == [["a", "too long", "c"], ["a"], ["too long"], ["c"], ["d"]]
+    assert delivered == [["a", "c"], ["d"]]
+    assert rejected == [(["too long"], 400)]
+
+
+def test_unauthorised_batch_is_not_split():
+    session = fake_session([fake_response(404, '{"message": "Unknown Webhook"}')])
+    rejected = []
+
+    queue, delivered = deliver(session, [["a", "b"]], rejected)
+
+    assert session.posted == [["a", "b"]]
+    assert delivered == []
+    assert rejected == [(["a", "b"], 404)]
@@ -0,0 +1,20 @@
+import asyncio
+
+import pytest
+
+from article import article
+from enrich import article_enricher
+
+
+@pytest.mark.parametrize("body", ["", "   ", "<!-- x -->"])
+def test_unparsable_detail_page_is_skipped(tmp_path, stub_site, body):
+    stub_site.serve("/empty", body)
+    stub_site.serve("/full", "<html><body><p>Severity: High</p><p>CVE-2024-38476</p></body></html>")
+    empty = article(f"{stub_site.url}/empty", "Empty page", "", "05 Mar 2024")
+    full = article(f"{stub_site.url}/full", "Full page", "", "05 Mar 2024")
+
+    asyncio.run(article_enricher(str(tmp_path / "detail_cache")).enrich([empty, full]))
+
+    assert "cves" not in empty
+    assert full["cves"] == ["CVE-2024-38476"]
+    assert full["severity"] == "High"
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from conftest import fixture_text
+from extract import cards_from_json, extract_cards, normalise_date
+
+BASE_URL = "https://www.csa.gov.sg"
+TIME_FORMAT = "%d %b %Y"
+
+
+def summary(cards):
+    return [(card["csa"], card["title"], card["description"], card["created"]) for card in cards]
+
+
+@pytest.mark.parametrize("parser", ["lxml", "bs4"])
+def test_static_listing(parser):
+    cards, path = extract_cards(fixture_text("listing_static.html"), BASE_URL, TIME_FORMAT, parser)
+
+    assert path == "static"
+    # the placeholder without a date is skipped, links are made absolute, dates normalised
+    assert summary(cards) == [
+        (f"{BASE_URL}/alerts-advisories/alerts/al-2024-031", "Critical Vulnerability in Fortinet FortiOS",
+         "Fortinet has released security updates to address a critical vulnerability (CVE-2024-21762) in FortiOS.",
+         "09 Mar 2024"),
+        (f"{BASE_URL}/alerts-advisories/alerts/al-2024-030", "Active Exploitation of Ivanti Connect Secure",
+         "", "02 Mar 2024"),
+        (f"{BASE_URL}/alerts-advisories/alerts/al-2024-029", "Vulnerabilities in Cisco ASA",
+         "Cisco has released updates.", "28 Feb 2024"),
+    ]
+    assert cards[0].created_at.day == 9
+
+
+def test_embedded_listing():
+    cards, path = extract_cards(fixture_text("listing_embedded.html"), BASE_URL, TIME_FORMAT)
+
+    assert path == "embedded"
+    assert summary(cards) == [
+        (f"{BASE_URL}/alerts-advisories/advisories/ad-2024-012", "Security Updates for Microsoft Products",
+         "Microsoft has released security updates for Windows.", "13 Mar 2024"),
+        (f"{BASE_URL}/alerts-advisories/advisories/ad-2024-011", "Apple Releases Security Updates",
+         "Apple has released updates for iOS.", "06 Mar 2024"),
+    ]
+
+
+def test_javascript_shell_has_no_cards():
+    assert extract_cards(fixture_text("listing_shell.html"), BASE_URL, TIME_FORMAT) == ([], None)
+
+
+def test_listing_endpoint_json():
+    cards = cards_from_json(json.loads(fixture_text("listing_endpoint.json")), BASE_URL, TIME_FORMAT)
+
+    # the duplicate card and the one without a readable date are left out
+    assert summary(cards) == [
+        (f"{BASE_URL}/alerts-advisories/security-bulletins/sb-2024-011", "Security Bulletin 13 Mar 2024",
+         "Weekly summary of vulnerabilities", "13 Mar 2024"),
+        (f"{BASE_URL}/alerts-advisories/security-bulletins/sb-2024-010", "Security Bulletin 6 Mar 2024",
+         "Weekly summary of vulnerabilities", "06 Mar 2024"),
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("09 Mar 2024", "09 Mar 2024"),
+    ("9 March 2024", "09 Mar 2024"),
+    ("2024-03-09T01:00:00Z", "09 Mar 2024"),
+    ("09/03/2024", "09 Mar 2024"),
+    ("next week", None),
+    (None, None),
+])
+def test_normalise_date(value, expected):
+    assert normalise_date(value, TIME_FORMAT) == expected
@@ -0,0 +1,118 @@
+import pytest
+
+from article import article
+
+ALERTS = "alerts-advisories/alerts"
+
+CARD = """<a class="m-card-article" href="/alerts-advisories/alerts/{slug}">
+  <div class="m-card-article__title">{title}</div>
+  <div class="m-card-article__desc">Apache HTTP Server remote code execution</div>
+  <div class="m-card-article__note">05 Mar 2024</div>
+</a>"""
+
+# the listing as served before javascript fills in the cards
+SHELL = "<html><body><div id=\"listing\"></div></body></html>"
+
+
+def static_page(*titles):
+    cards = "".join(CARD.format(slug=title.lower().replace(" ", "-"), title=title) for title in titles)
+    return f"<html><body>{cards}</body></html>"
+
+
+def rendered(*titles):
+    return [article(f"https://example/{title}", title, "Apache", "05 Mar 2024") for title in titles]
+
+
+def tick(csa, subdomain=ALERTS):
+    # One successful read of the listing, committed like a finished tick
+    results, entry = csa.fetch_listing(subdomain)
+    if entry:
+        csa.http_cache.keep(subdomain, entry)
+    csa.http_cache.commit()
+    return results
+
+
+def test_static_listing_is_unchanged_on_304(reporter, stub_site):
+    stub_site.serve(f"/{ALERTS}", static_page("First alert"), etag='"v1"')
+
+    assert [card["title"] for card in tick(reporter)] == ["First alert"]
+    assert tick(reporter) is None
+    assert reporter.fetch_path[ALERTS] == "unchanged"
+    assert stub_site.validators_sent(f"/{ALERTS}") == [None, '"v1"']
+
+
+def test_static_listing_with_new_cards_is_read(reporter, stub_site):
+    stub_site.serve(f"/{ALERTS}", static_page("First alert"), etag='"v1"')
+    tick(reporter)
+    stub_site.serve(f"/{ALERTS}", static_page("Second alert", "First alert"), etag='"v2"')
+
+    assert [card["title"] for card in tick(reporter)] == ["Second alert", "First alert"]
+
+
+def test_same_page_without_validators_compares_cards(reporter, stub_site):
+    stub_site.serve(f"/{ALERTS}", static_page("First alert"))
+    tick(reporter)
+
+    assert tick(reporter) is None
+
+
+def test_browser_listing_is_rendered_after_304(reporter, stub_site, monkeypatch):
+    # the html shell never changes, the rendered cards do
+    stub_site.serve(f"/{ALERTS}", SHELL, etag='"shell"')
+    renders = [rendered("First alert"), rendered("Second alert", "First alert"),
+               rendered("Second alert", "First alert")]
+    monkeypatch.setattr(reporter, "get_list_browser", lambda subdomain: renders.pop(0))
+
+    assert [card["title"] for card in tick(reporter)] == ["First alert"]
+    assert [card["title"] for card in tick(reporter)] == ["Second alert", "First alert"]
+    assert reporter.fetch_path[ALERTS] == "browser"
+    # rendered again, with the same cards the filter is skipped
+    assert tick(reporter) is None
+    assert renders == []
+    assert stub_site.validators_sent(f"/{ALERTS}") == [None, '"shell"', '"shell"']
+
+
+def test_json_listing_is_read_again_after_304(reporter, stub_site):
+    stub_site.serve(f"/{ALERTS}", SHELL, etag='"shell"')
+    stub_site.serve("/api/alerts", '{"items": [{"title": "First alert", "url": "/a1", "date": "2024-03-05"}]}')
+    reporter.listing_endpoints = {ALERTS: f"{stub_site.url}/api/alerts"}
+    tick(reporter)
+    stub_site.serve("/api/alerts", '{"items": [{"title": "Second alert", "url": "/a2", "date": "2024-03-06"}, '
+                                   '{"title": "First alert", "url": "/a1", "date": "2024-03-05"}]}')
+
+    assert [card["title"] for card in tick(reporter)] == ["Second alert", "First alert"]
+    assert reporter.fetch_path[ALERTS] == "json"
+
+
+def test_unavailable_listing_keeps_nothing(reporter, stub_site):
+    assert tick(reporter) is None
+    assert reporter.http_cache.entries == {}
+
+
+@pytest.mark.parametrize("path, expected", [("static", True), ("browser", False)])
+def test_probe_reads_cards_not_html(reporter, stub_site, monkeypatch, path, expected):
+    monkeypatch.setattr(reporter, "section_paths", {"ALERTS": ALERTS})
+    monkeypatch.setattr(reporter, "get_list_browser", lambda subdomain: rendered("First alert"))
+    stub_site.serve(f"/{ALERTS}", static_page("First alert") if path == "static" else SHELL)
+    tick(reporter)
+    assert not reporter.probe_listings()
+
+    # new cards behind the same url, a browser listing waits for its tick
+    stub_site.serve(f"/{ALERTS}", static_page("Second alert", "First alert") if path == "static" else SHELL)
+    assert reporter.probe_listings() is expected
+
+
+def test_failed_render_is_fetched_again(reporter, stub_site, monkeypatch):
+    stub_site.serve(f"/{ALERTS}", SHELL, etag='"shell"')
+
+    def timed_out(subdomain):
+        raise RuntimeError("card wait timed out")
+
+    monkeypatch.setattr(reporter, "get_list_browser", timed_out)
+    with pytest.raises(RuntimeError):
+        reporter.fetch_listing(ALERTS)
+    reporter.http_cache.commit()
+    assert reporter.http_cache.entries == {}
+
+    monkeypatch.setattr(reporter, "get_list_browser", lambda subdomain: rendered("First alert"))
+    assert [card["title"] for card in tick(reporter)] == ["First alert"]
@@ -0,0 +1,11 @@
+from keep_alive import app
+
+
+def test_liveness_and_metrics_routes():
+    client = app.test_client()
+
+    assert client.get("/").status_code == 200
+    assert client.head("/").status_code == 200
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.mimetype == "text/plain"
@@ -0,0 +1,42 @@
+import sqlite3
+
+from article import article
+from outbox import outbox
+
+
+def queued(*titles):
+    return [article(f"https://example/{title}", title, "", "05 Mar 2024") for title in titles]
+
+
+def test_failed_articles_leave_the_queue(tmp_path):
+    box = outbox(str(tmp_path / "outbox.db"))
+    box.add("ALERTS", queued("a", "b", "c"))
+    ids = [row[0] for row in box.pending()]
+
+    box.mark_sent(ids[:1])
+    box.mark_failed(ids[1:2], "HTTP 400")
+
+    assert [row[3]["title"] for row in box.pending()] == ["c"]
+    # a failed article is not queued again by the next tick either
+    box.add("ALERTS", queued("b"))
+    assert [row[3]["title"] for row in box.pending()] == ["c"]
+    box.close()
+
+
+def test_outbox_without_failed_column_is_migrated(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, section TEXT NOT NULL, "
+                 "subscriber TEXT NOT NULL, url TEXT NOT NULL, article TEXT NOT NULL, queued_at REAL NOT NULL, "
+                 "sent_at REAL, UNIQUE (section, subscriber, url))")
+    conn.execute("INSERT INTO outbox (section, subscriber, url, article, queued_at) VALUES "
+                 "('ALERTS', 'default', 'https://example/a', '{\"csa\": \"https://example/a\", \"title\": \"a\", "
+                 "\"description\": \"\", \"created\": \"05 Mar 2024\"}', 0)")
+    conn.commit()
+    conn.close()
+
+    box = outbox(path)
+    box.mark_failed([box.pending()[0][0]], "HTTP 400")
+
+    assert box.pending() == []
+    box.close()
@@ -0,0 +1,44 @@
+import asyncio
+
+from article import article
+from revisions import fingerprint_store, render_change
+
+
+def card(title: str, description: str = "Apache HTTP Server remote code execution"):
+    return article(f"https://csa/{title.lower().replace(' ', '-')}", title, description, "05 Mar 2024")
+
+
+def test_revised_card_is_posted_with_what_changed(reporter):
+    reporter.fingerprints.record(card("First advisory"))
+    revised = card("First advisory", "Apache HTTP Server remote code execution, patch now available")
+
+    reporter.filter_new_advs([revised])
+    asyncio.run(reporter.track_revisions())
+
+    [obj] = reporter.revised_articles()["ADVISORIES"]
+    assert obj["changes"] == {"description": ["Apache HTTP Server remote code execution",
+                                              "Apache HTTP Server remote code execution, patch now available"]}
+    embed = reporter.generate_updated_message("ADVISORIES", obj)
+    assert embed.title == "♻️ *Updated: First advisory*"
+    [published, description, link] = embed.fields
+    assert description.name == "✏️  *Description*"
+    assert description.value == "Apache HTTP Server remote code ~~execution~~ **execution, patch now available**"
+    # the next tick sees the revised card as the current one
+    assert reporter.fingerprints.revised(revised) is None
+
+
+def test_list_changes_are_rendered_line_by_line():
+    assert render_change(["CVE-2024-1"], ["CVE-2024-1", "CVE-2024-2"]) == "+ CVE-2024-2"
+    assert render_change("same", "same") == "same"
+
+
+def test_recording_again_keeps_the_oldest_first_order(tmp_path):
+    store = fingerprint_store(str(tmp_path / "fingerprints.json"), max_entries=2)
+    for title in ("First", "Second", "Third"):
+        store.record(card(title))
+    # a revision of the oldest article does not make it the newest
+    store.record(card("First", "revised"))
+
+    store.commit()
+
+    assert list(store.entries) == ["https://csa/second", "https://csa/third"]
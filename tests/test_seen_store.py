@@ -0,0 +1,37 @@
+from article import article
+from seen_store import article_keys, seen_store
+
+
+def card(title: str, created: str = "05 Mar 2024"):
+    return article(f"https://csa/{title.lower().replace(' ', '-')}", title, f"{title} details", created)
+
+
+def test_first_pass_migrates_the_record_watermark(reporter):
+    # record.json from before the seen store, the newest alert handled was "Second alert"
+    reporter.state.update({"ALERTS_CREATED": "04 Mar 2024", "ALERTS_LATEST_TITLE": "Second alert"})
+    reporter.load_lasttimes()
+    listing = [card("Third alert"), card("Second alert", "04 Mar 2024"), card("First alert", "01 Mar 2024")]
+
+    reporter.filter_new_alerts(listing)
+
+    assert list(reporter.new_alerts_title) == ["Third alert"]
+    reporter.update_lasttimes()
+    # from here on the index decides, whatever the dates say
+    reporter.filter_new_alerts([card("Older but new", "01 Jan 2024")] + listing)
+    assert list(reporter.new_alerts_title) == ["Older but new"]
+
+
+def test_compaction_keeps_the_newest_keys(tmp_path):
+    path = str(tmp_path / "seen.log")
+    seen = seen_store(path, max_entries=6)
+    cards = [card(f"Alert {i}") for i in range(5)]
+    for c in cards:
+        seen.add("ALERTS", c)
+        seen.commit()
+
+    # two keys per article, the three newest articles are kept
+    assert len(seen) == 6
+    assert [seen.seen(c) for c in cards] == [False, False, True, True, True]
+    reopened = seen_store(path, max_entries=6)
+    assert list(reopened.entries) == list(seen.entries)
+    assert list(reopened.entries)[-2:] == list(article_keys(cards[-1]))
@@ -0,0 +1,49 @@
+from article import article
+from similarity import similarity_index
+
+TITLE = "Critical vulnerability in Apache HTTP Server mod_proxy"
+DESCRIPTION = "Apache has released updates for CVE-2024-38476 in HTTP Server mod_proxy"
+
+
+def routed(url: str, section: str, *subscribers):
+    obj = article(url, TITLE, DESCRIPTION, "05 Mar 2024", section)
+    obj["routes"] = {name: [] for name in subscribers}
+    return obj
+
+
+def index(tmp_path):
+    return similarity_index(str(tmp_path / "similarity.json"))
+
+
+def test_duplicates_for_the_same_subscriber_are_merged(tmp_path):
+    alert = routed("https://example/alert", "ALERTS", "x", "y")
+    bulletin = routed("https://example/bulletin", "BULLETINS", "y")
+
+    kept, dropped = index(tmp_path).cluster({"ALERTS": [alert], "BULLETINS": [bulletin]})
+
+    assert kept == {"ALERTS": [alert], "BULLETINS": []}
+    assert alert["related"][0]["csa"] == "https://example/bulletin"
+
+
+def test_duplicate_for_another_subscriber_is_kept(tmp_path):
+    alert = routed("https://example/alert", "ALERTS", "x")
+    bulletin = routed("https://example/bulletin", "BULLETINS", "y")
+
+    kept, dropped = index(tmp_path).cluster({"ALERTS": [alert], "BULLETINS": [bulletin]})
+
+    assert kept == {"ALERTS": [alert], "BULLETINS": [bulletin]}
+    assert "related" not in alert
+
+
+def test_earlier_notification_only_covers_its_subscribers(tmp_path):
+    similarity = index(tmp_path)
+    similarity.cluster({"ALERTS": [routed("https://example/alert", "ALERTS", "x")]})
+    similarity.commit()
+
+    similarity = index(tmp_path)
+    same_channel = routed("https://example/bulletin", "BULLETINS", "x")
+    other_channel = routed("https://example/advisory", "ADVISORIES", "y")
+    kept, dropped = similarity.cluster({"ADVISORIES": [other_channel], "BULLETINS": [same_channel]})
+
+    assert kept == {"ADVISORIES": [other_channel], "BULLETINS": []}
+    assert dropped == 1
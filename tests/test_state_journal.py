@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from state_journal import state_journal
+
+
+def paths(tmp_path):
+    return str(tmp_path / "record.json"), str(tmp_path / "record.journal")
+
+
+def test_torn_last_journal_line_is_dropped(tmp_path):
+    snapshot, journal = paths(tmp_path)
+    with open(journal, "w") as journal_file:
+        journal_file.write(json.dumps({"ALERTS_LATEST_TITLE": "First alert"}) + "\n")
+        journal_file.write('{"ALERTS_LATEST_TITLE": "Sec')
+
+    state = state_journal(snapshot, journal)
+
+    assert state.get("ALERTS_LATEST_TITLE") == "First alert"
+    # the journal was started afresh, so a new line is not glued to the torn one
+    state.update({"ADVISORIES_LATEST_TITLE": "First advisory"})
+    assert state_journal(snapshot, journal).state == {"ALERTS_LATEST_TITLE": "First alert",
+                                                      "ADVISORIES_LATEST_TITLE": "First advisory"}
+
+
+def test_truncated_snapshot_is_recovered_from_the_journal(tmp_path):
+    snapshot, journal = paths(tmp_path)
+    state = state_journal(snapshot, journal)
+    state.update({"ALERTS_CREATED": "05 Mar 2024", "ALERTS_LATEST_TITLE": "First alert"})
+    # record.json cut short by the old in-place rewrite
+    with open(snapshot, "w") as json_file:
+        json_file.write('{"ALERTS_CREATED": "01 Ma')
+
+    recovered = state_journal(snapshot, journal)
+
+    assert recovered.state == {"ALERTS_CREATED": "05 Mar 2024", "ALERTS_LATEST_TITLE": "First alert"}
+
+
+def test_crash_between_snapshot_and_journal_truncation(tmp_path, monkeypatch):
+    snapshot, journal = paths(tmp_path)
+    state = state_journal(snapshot, journal, compact_every=3)
+    state.update({"ALERTS_LATEST_TITLE": "First alert"})
+    state.update({"ALERTS_LATEST_TITLE": "Second alert"})
+
+    def crash_on_truncate(path, mode="r", *args, **kwargs):
+        if path == journal and mode == "w":
+            raise OSError("killed")
+        return open(path, mode, *args, **kwargs)
+
+    # the new snapshot is in place, the journal still holds the lines it covers
+    monkeypatch.setattr("state_journal.open", crash_on_truncate, raising=False)
+    with pytest.raises(OSError):
+        state.update({"ALERTS_LATEST_TITLE": "Third alert"})
+    monkeypatch.undo()
+
+    with open(snapshot, "r") as json_file:
+        assert json.load(json_file) == {"ALERTS_LATEST_TITLE": "Third alert"}
+    recovered = state_journal(snapshot, journal)
+    assert recovered.state == {"ALERTS_LATEST_TITLE": "Third alert"}
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import main
+from outbox import outbox
+from subscribers import DEFAULT
+
+ALERTS = "alerts-advisories/alerts"
+
+CARD = """<a class="m-card-article" href="/alerts-advisories/alerts/{slug}">
+  <div class="m-card-article__title">{title}</div>
+  <div class="m-card-article__desc">Apache HTTP Server remote code execution</div>
+  <div class="m-card-article__note">05 Mar 2024</div>
+</a>"""
+
+
+def static_page(*titles):
+    cards = "".join(CARD.format(slug=title.lower().replace(" ", "-"), title=title) for title in titles)
+    return f"<html><body>{cards}</body></html>"
+
+
+@pytest.fixture
+def ticking(reporter, tmp_path, monkeypatch):
+    # main's tick on the stub site, with its own outbox and a webhook that records every embed
+    posted = []
+
+    async def sendtowebhook(webhookurl, content, session, ids):
+        for batch, embed_ids in zip(content, ids):
+            posted.extend(embed.title for embed in batch)
+            main.article_outbox.mark_sent([row_id for row_ids in embed_ids for row_id in row_ids])
+
+    monkeypatch.setattr(main, "get_reporter", lambda: reporter)
+    monkeypatch.setattr(main, "article_outbox", outbox(str(tmp_path / "outbox.db")))
+    monkeypatch.setattr(main, "sendtowebhook", sendtowebhook)
+    monkeypatch.setattr(reporter.subscribers, "webhooks", lambda: {DEFAULT: "https://discord.invalid/hook"})
+    return posted
+
+
+def test_articles_of_a_failed_tick_go_out_on_the_next_one(reporter, stub_site, ticking, monkeypatch):
+    stub_site.serve(f"/{ALERTS}", static_page("Old alert"), etag='"v1"')
+    asyncio.run(main.itscheckintime())
+    assert ticking == []
+
+    stub_site.serve(f"/{ALERTS}", static_page("New alert", "Old alert"), etag='"v2"')
+
+    async def broken():
+        raise RuntimeError("detail cache not writable")
+
+    # fails after the listing was filtered, before anything reached the outbox
+    with monkeypatch.context() as patched:
+        patched.setattr(reporter, "expand_new_bulletins", broken)
+        with pytest.raises(RuntimeError):
+            asyncio.run(main.itscheckintime())
+    assert main.article_outbox.pending() == []
+
+    asyncio.run(main.itscheckintime())
+
+    assert any("New alert" in title for title in ticking)
+    assert not any("Old alert" in title for title in ticking)
+
+
+def test_next_tick_runs_however_late_it_starts(tmp_path, monkeypatch):
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    from adaptive import adaptive_poller
+
+    monkeypatch.setattr(main, "scheduler", AsyncIOScheduler(timezone="Asia/Singapore"))
+    monkeypatch.setattr(main, "poller", adaptive_poller(str(tmp_path / "schedule.json"), ("ALERTS",)))
+
+    main.schedule_next_tick()
+    main.schedule_digest(0)
+
+    for job_id in ("tick", "digest"):
+        job = main.scheduler.get_job(job_id)
+        assert job.misfire_grace_time is None
+        assert job.coalesce
+
+
+def test_once_reports_articles_without_a_webhook_as_undelivered(reporter, ticking, monkeypatch):
+    from article import article
+
+    monkeypatch.setattr(reporter.subscribers, "webhooks", lambda: {})
+    main.article_outbox.add("ALERTS", [article("https://csa/alert", "New alert", "Apache", "05 Mar 2024")])
+
+    assert asyncio.run(main.run_once()) == main.EXIT_UNDELIVERED
+    assert len(main.article_outbox.pending()) == 1